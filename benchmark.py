@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Reproducible benchmark for every stage of the cluster_tool pipeline.
+
+Generates a synthetic corpus with latent topics, then measures wall time, CPU time and
+peak RSS for preprocessing, vectorization, clustering (per algorithm), keyword extraction
+and result writing. Results are written as JSON so runs from two commits can be diffed.
+
+Usage examples:
+  python benchmark.py --rows 50000 --out bench_new.json
+  python benchmark.py --rows 50000 --algorithms kmeans,agglomerative_knn --compare bench_old.json
+  python benchmark.py --startup --startup_budget 0.5
+  python benchmark.py --memory_check --memory_rows 1000000 --memory_ceiling_mb 2048
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import cluster_tool
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_ALGORITHMS = "kmeans,minibatch_kmeans,agglomerative_knn,dbscan_fast"
+# --compare_dtypes fits kmeans/minibatch_kmeans from this many shared k-means++ starts per dtype
+DTYPE_KMEANS_STARTS = 5
+KMEANS_ALGORITHMS = ("kmeans", "minibatch_kmeans")
+
+# --memory_check: rows, the peak RSS allowed for the whole run, and the most keyword extraction may add
+# (densifying 1M x 2000 float64 would need ~16 GB; centroids need n_clusters x n_features)
+MEMORY_CHECK_ROWS = 1000000
+MEMORY_CEILING_MB = 2048
+KEYWORDS_CEILING_MB = 256
+MEMORY_CHECK_ALGORITHM = "minibatch_kmeans"
+
+# None of these may be imported by `import cluster_tool` (checked by --startup)
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "sklearn", "matplotlib", "seaborn", "joblib")
+
+
+def make_synthetic_corpus(
+    n_rows: int = 20000, vocab_size: int = 5000, doc_len: int = 30, n_topics: int = 8, seed: int = 0
+) -> Tuple[List[str], np.ndarray]:
+    """Texts drawn from n_topics latent topics over a shared vocabulary.
+
+    Each topic has its own Zipf-like distribution over a random permutation of the vocabulary;
+    20% of every document comes from a topic-independent background distribution. Document
+    lengths are Poisson around doc_len. Returns (texts, topic_per_row).
+    """
+    import numpy as np
+
+    rng = np.random.RandomState(seed)
+    syllables = np.array(["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "de", "po", "qu", "zen"])
+    vocab = np.array(["".join(rng.choice(syllables, 3)) + str(i) for i in range(vocab_size)])
+    zipf = 1.0 / np.arange(1, vocab_size + 1)
+    zipf /= zipf.sum()
+    topic_dists = np.stack([zipf[np.argsort(rng.permutation(vocab_size))] for _ in range(n_topics)])
+    background = zipf[np.argsort(rng.permutation(vocab_size))]
+
+    topics = rng.randint(n_topics, size=n_rows)
+    lengths = np.maximum(1, rng.poisson(doc_len, size=n_rows))
+    texts = []
+    for topic, length in zip(topics, lengths):
+        n_bg = rng.binomial(length, 0.2)
+        words = np.concatenate(
+            [rng.choice(vocab_size, length - n_bg, p=topic_dists[topic]), rng.choice(vocab_size, n_bg, p=background)]
+        )
+        texts.append(" ".join(vocab[words]))
+    return texts, topics
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _versions() -> dict:
+    versions = {"python": platform.python_version()}
+    for name in ("numpy", "scipy", "pandas", "sklearn", "openpyxl"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return versions
+
+
+def run_benchmark(args) -> dict:
+    import pandas as pd
+
+    profiler = cluster_tool.StageProfiler(args.profile_stage, cprofile_prefix=args.profile_prefix)
+    texts, _ = make_synthetic_corpus(args.rows, args.vocab, args.doc_len, args.topics, args.seed)
+    algorithms = [a for a in args.algorithms.split(",") if a]
+
+    with profiler.stage("preprocess"):
+        processed = cluster_tool.preprocess_texts(texts, normalizers=args.normalize, n_jobs=args.preprocess_jobs)
+    with profiler.stage("vectorize"):
+        vectorizer, X = cluster_tool.vectorize_texts(
+            processed, max_features=args.max_features, dtype=args.dtype, n_jobs=args.vectorize_jobs
+        )
+    Z = X
+    if args.lsa:
+        with profiler.stage("lsa"):
+            _, Z, explained = cluster_tool.fit_lsa(X, n_components=args.lsa, random_state=args.seed)
+        print(f"LSA: {Z.shape[1]} components, explained variance {explained:.1%}")
+
+    with tempfile.TemporaryDirectory(prefix="text_analyzer_bench_") as tmp:
+        for algorithm in algorithms:
+            with profiler.stage("cluster", algorithm=algorithm):
+                _, labels = cluster_tool.cluster_texts(
+                    Z, algorithm=algorithm, n_clusters=args.topics, random_state=args.seed
+                )
+            with profiler.stage("keywords", algorithm=algorithm):
+                top_keywords = cluster_tool.get_top_keywords_per_cluster(vectorizer, X, labels, top_n=10)
+                names = cluster_tool.assign_cluster_names(top_keywords)
+            df = pd.DataFrame({"text": texts, "cluster_label": labels})
+            df["cluster_name"] = [names.get(int(l), "") for l in labels]
+            out_path = os.path.join(tmp, f"{algorithm}.{args.save_format}")
+            with profiler.stage("save", algorithm=algorithm, format=args.save_format):
+                cluster_tool.save_results_excel(df, out_path)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _versions(),
+        },
+        "params": {
+            "rows": args.rows,
+            "vocab": args.vocab,
+            "doc_len": args.doc_len,
+            "topics": args.topics,
+            "max_features": args.max_features,
+            "dtype": args.dtype,
+            "vectorize_jobs": args.vectorize_jobs,
+            "lsa": args.lsa,
+            "normalize": args.normalize,
+            "seed": args.seed,
+            "algorithms": algorithms,
+            "save_format": args.save_format,
+        },
+        "stages": profiler.records,
+    }
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) from `python -X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # one space follows the separator; deeper imports are indented further
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_startup(repeats: int = 5) -> dict:
+    """Cold-start cost of cluster_tool, each measurement in a fresh interpreter.
+
+    Times `cluster_tool.py --help` (best of `repeats`), and records `-X importtime` for
+    `import cluster_tool` along with any heavy modules that import pulled in.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    help_seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(here, "cluster_tool.py"), "--help"], cwd=here, capture_output=True, check=True)
+        help_seconds.append(time.perf_counter() - start)
+
+    probe = f"import sys, cluster_tool; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=here, capture_output=True, text=True, check=True)
+    rows = _parse_importtime(proc.stderr)
+    top_level = sorted((r for r in rows if not r[0].startswith(" ")), key=lambda r: r[2], reverse=True)
+    return {
+        "help_seconds": min(help_seconds),
+        "help_seconds_all": help_seconds,
+        "import_cluster_tool_us": next((r[2] for r in rows if r[0].strip() == "cluster_tool"), None),
+        "heavy_modules_loaded": [m for m in proc.stdout.strip().split(",") if m],
+        "slowest_imports": [{"module": name.strip(), "cumulative_us": cum} for name, _, cum in top_level[:10]],
+    }
+
+
+def check_startup(startup: dict, budget: float) -> bool:
+    """Print the startup report; return True if it is within budget."""
+    print(f"cluster_tool.py --help: {startup['help_seconds']:.3f}s (best of {len(startup['help_seconds_all'])}, budget {budget:.3f}s)")
+    if startup["import_cluster_tool_us"] is not None:
+        print(f"import cluster_tool: {startup['import_cluster_tool_us'] / 1000:.1f} ms")
+    print("Slowest top-level imports:")
+    for entry in startup["slowest_imports"]:
+        print(f"  {entry['module']:<32} {entry['cumulative_us'] / 1000:8.1f} ms")
+    ok = True
+    if startup["heavy_modules_loaded"]:
+        print(f"Heavy modules imported at startup: {', '.join(startup['heavy_modules_loaded'])}")
+        ok = False
+    if startup["help_seconds"] > budget:
+        print(f"Startup over budget by {startup['help_seconds'] - budget:.3f}s")
+        ok = False
+    return ok
+
+
+def compare_dtypes(args) -> dict:
+    """Run vectorize + cluster once per dtype and measure label agreement against float64.
+
+    Returns {"stages": [...], "agreement": {algorithm: adjusted Rand index}, "matrix_mb": {dtype: MB}}.
+    """
+    from sklearn.cluster import kmeans_plusplus
+    from sklearn.metrics import adjusted_rand_score
+
+    profiler = cluster_tool.StageProfiler()
+    texts, _ = make_synthetic_corpus(args.rows, args.vocab, args.doc_len, args.topics, args.seed)
+    processed = cluster_tool.preprocess_texts(texts, normalizers=args.normalize, n_jobs=args.preprocess_jobs)
+    algorithms = [a for a in args.algorithms.split(",") if a]
+    labels, matrix_mb, starts = {}, {}, None
+    for dtype in ("float64", "float32"):
+        with profiler.stage("vectorize", algorithm=dtype):
+            _, X = cluster_tool.vectorize_texts(processed, max_features=args.max_features, dtype=dtype)
+        matrix_mb[dtype] = (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 1024 ** 2
+        if starts is None:
+            # k-means++ seeding depends on distances, so each dtype would otherwise start from different
+            # centroids and the comparison would measure which local optimum each run fell into
+            starts = [kmeans_plusplus(X, args.topics, random_state=args.seed + i)[0] for i in range(DTYPE_KMEANS_STARTS)]
+        for algorithm in algorithms:
+            with profiler.stage("cluster", algorithm=f"{algorithm}/{dtype}"):
+                if algorithm in KMEANS_ALGORITHMS:
+                    # best of the same starts for both dtypes
+                    fits = [
+                        cluster_tool.cluster_texts(
+                            X, algorithm=algorithm, n_clusters=args.topics, random_state=args.seed, init=c.astype(X.dtype)
+                        )
+                        for c in starts
+                    ]
+                    labels[algorithm, dtype] = min(fits, key=lambda fit: fit[0].inertia_)[1]
+                else:
+                    _, labels[algorithm, dtype] = cluster_tool.cluster_texts(
+                        X, algorithm=algorithm, n_clusters=args.topics, random_state=args.seed
+                    )
+        del X
+    agreement = {a: float(adjusted_rand_score(labels[a, "float64"], labels[a, "float32"])) for a in algorithms}
+    return {"stages": profiler.records, "agreement": agreement, "matrix_mb": matrix_mb}
+
+
+def check_dtypes(result: dict, min_agreement: float) -> bool:
+    """Print the float32/float64 comparison; return True if every algorithm agrees well enough."""
+    print(f"TF-IDF matrix: float64 {result['matrix_mb']['float64']:.1f} MB, float32 {result['matrix_mb']['float32']:.1f} MB")
+    stages = {_stage_key(r): r for r in result["stages"]}
+    # Peak-RSS deltas are not compared: the second pass reuses memory the first one already grew into
+    print(f"{'algorithm':<24} {'f64_s':>8} {'f32_s':>8} {'ARI':>7}")
+    ok = True
+    for algorithm, ari in result["agreement"].items():
+        r64, r32 = stages[f"cluster[{algorithm}/float64]"], stages[f"cluster[{algorithm}/float32]"]
+        flag = ""
+        if ari < min_agreement:
+            ok = False
+            flag = "  <-- labels disagree"
+        print(f"{algorithm:<24} {r64['wall_s']:>8.3f} {r32['wall_s']:>8.3f} {ari:>7.4f}{flag}")
+    return ok
+
+
+def measure_memory(args) -> dict:
+    """Generate args.memory_rows rows and run preprocess, vectorize, cluster and keywords under StageProfiler.
+
+    Nothing is written to disk. Returns {"rows": n, "stages": [...]}.
+    """
+    profiler = cluster_tool.StageProfiler()
+    with profiler.stage("generate"):
+        texts, _ = make_synthetic_corpus(args.memory_rows, args.vocab, args.doc_len, args.topics, args.seed)
+    with profiler.stage("preprocess"):
+        processed = cluster_tool.preprocess_texts(texts, normalizers=args.normalize, n_jobs=args.preprocess_jobs)
+    with profiler.stage("vectorize"):
+        vectorizer, X = cluster_tool.vectorize_texts(
+            processed, max_features=args.max_features, dtype=args.dtype, n_jobs=args.vectorize_jobs
+        )
+    with profiler.stage("cluster", algorithm=MEMORY_CHECK_ALGORITHM):
+        _, labels = cluster_tool.cluster_texts(
+            X, algorithm=MEMORY_CHECK_ALGORITHM, n_clusters=args.topics, random_state=args.seed
+        )
+    with profiler.stage("keywords"):
+        top_keywords = cluster_tool.get_top_keywords_per_cluster(vectorizer, X, labels, top_n=10)
+        cluster_tool.assign_cluster_names(top_keywords, labels=labels)
+    return {"rows": len(texts), "stages": profiler.records}
+
+
+def check_memory(result: dict, ceiling_mb: float, keywords_ceiling_mb: float) -> bool:
+    """Print per-stage peak RSS; return True if the run stayed under both ceilings."""
+    stages = result["stages"]
+    if any("peak_rss_mb" not in r for r in stages):
+        print("Peak RSS cannot be measured on this platform; the memory ceiling was not checked.")
+        return False
+    print(f"{'stage':<28} {'wall_s':>8} {'peak_mb':>9} {'delta_mb':>9}  ({result['rows']} rows)")
+    for r in stages:
+        print(f"{_stage_key(r):<28} {r['wall_s']:>8.2f} {r['peak_rss_mb']:>9.1f} {r['rss_delta_mb']:>+9.1f}")
+    ok = True
+    peak = max(r["peak_rss_mb"] for r in stages)
+    print(f"Peak RSS {peak:.1f} MB (ceiling {ceiling_mb:.0f} MB)")
+    if peak > ceiling_mb:
+        print(f"Peak RSS over the ceiling by {peak - ceiling_mb:.1f} MB")
+        ok = False
+    keywords = next(r for r in stages if r["stage"] == "keywords")
+    if keywords["rss_delta_mb"] > keywords_ceiling_mb:
+        print(f"Keyword extraction grew RSS by {keywords['rss_delta_mb']:.1f} MB (limit {keywords_ceiling_mb:.0f} MB)")
+        ok = False
+    return ok
+
+
+def _stage_key(record: dict) -> str:
+    return record["stage"] + (f"[{record['algorithm']}]" if record.get("algorithm") else "")
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.2) -> bool:
+    """Print per-stage deltas against a baseline run; return True if any stage regressed past threshold."""
+    if baseline.get("params") != current.get("params"):
+        print("Warning: benchmark parameters differ from the baseline; deltas may not be meaningful.")
+    base = {_stage_key(r): r for r in baseline.get("stages", [])}
+    regressed = False
+    print(f"{'stage':<32} {'base_s':>9} {'now_s':>9} {'delta':>8} {'base_mb':>9} {'now_mb':>9}")
+    for record in current["stages"]:
+        key = _stage_key(record)
+        old = base.get(key)
+        if old is None:
+            print(f"{key:<32} {'-':>9} {record['wall_s']:>9.3f} {'new':>8}")
+            continue
+        delta = (record["wall_s"] - old["wall_s"]) / old["wall_s"] if old["wall_s"] > 0 else 0.0
+        flag = ""
+        if delta > threshold:
+            regressed = True
+            flag = "  <-- slower"
+        print(
+            f"{key:<32} {old['wall_s']:>9.3f} {record['wall_s']:>9.3f} {delta:>+8.1%} "
+            f"{old.get('rss_delta_mb', float('nan')):>9.1f} {record.get('rss_delta_mb', float('nan')):>9.1f}{flag}"
+        )
+    return regressed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the cluster_tool pipeline on a synthetic corpus.")
+    parser.add_argument("--rows", type=int, default=20000, help="Number of synthetic documents")
+    parser.add_argument("--vocab", type=int, default=5000, help="Vocabulary size")
+    parser.add_argument("--doc_len", type=int, default=30, help="Mean document length in words")
+    parser.add_argument("--topics", type=int, default=8, help="Latent topics (also used as n_clusters)")
+    parser.add_argument("--max_features", type=int, default=2000, help="Max features for TF-IDF")
+    parser.add_argument("--lsa", type=int, default=0, help="LSA components to cluster on (0 = raw TF-IDF)")
+    parser.add_argument("--dtype", choices=cluster_tool.DTYPES, default=cluster_tool.DEFAULT_DTYPE, help="TF-IDF precision")
+    parser.add_argument("--normalize", default=",".join(cluster_tool.DEFAULT_NORMALIZERS), help="Preprocessing steps to benchmark")
+    parser.add_argument("--vectorize_jobs", type=int, default=-1, help="Worker processes for TF-IDF counting")
+    parser.add_argument("--preprocess_jobs", type=int, default=-1, help="Worker processes for expensive normalizers")
+    parser.add_argument("--algorithms", default=DEFAULT_ALGORITHMS, help="Comma-separated algorithms to benchmark")
+    parser.add_argument("--save_format", choices=["xlsx", "csv", "parquet"], default="xlsx", help="Output format for the save stage")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for corpus generation and clustering")
+    parser.add_argument("--out", default=None, help="Write results JSON to this path")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative wall-time slowdown counted as a regression")
+    parser.add_argument("--profile_stage", action="append", default=[], help="Run this stage under cProfile (repeatable)")
+    parser.add_argument("--profile_prefix", default="bench_profile", help="Prefix for cProfile .prof files")
+    parser.add_argument("--startup", action="store_true", help="Only measure cold-start time of cluster_tool and check it")
+    parser.add_argument("--startup_budget", type=float, default=0.5, help="Seconds allowed for a cold `cluster_tool.py --help`")
+    parser.add_argument("--startup_repeats", type=int, default=5, help="Fresh interpreters timed for --startup")
+    parser.add_argument(
+        "--compare_dtypes",
+        action="store_true",
+        help="Only compare float32 against float64: time, memory and label agreement (adjusted Rand index)",
+    )
+    parser.add_argument("--min_agreement", type=float, default=0.99, help="Lowest ARI accepted by --compare_dtypes")
+    parser.add_argument(
+        "--memory_check",
+        action="store_true",
+        help="Only run the pipeline on --memory_rows rows and fail if peak RSS exceeds --memory_ceiling_mb",
+    )
+    parser.add_argument("--memory_rows", type=int, default=MEMORY_CHECK_ROWS, help="Synthetic rows for --memory_check")
+    parser.add_argument("--memory_ceiling_mb", type=float, default=MEMORY_CEILING_MB, help="Peak RSS allowed by --memory_check")
+    parser.add_argument(
+        "--keywords_ceiling_mb",
+        type=float,
+        default=KEYWORDS_CEILING_MB,
+        help="RSS growth allowed for keyword extraction in --memory_check",
+    )
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = measure_startup(args.startup_repeats)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"meta": {"git_commit": _git_commit(), "versions": _versions()}, "startup": startup}, f, indent=2)
+        if not check_startup(startup, args.startup_budget):
+            sys.exit(1)
+        return
+
+    if args.compare_dtypes:
+        result = compare_dtypes(args)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"meta": {"git_commit": _git_commit(), "versions": _versions()}, **result}, f, indent=2)
+        if not check_dtypes(result, args.min_agreement):
+            print(f"float32 labels differ from float64 (adjusted Rand index below {args.min_agreement}).")
+            sys.exit(1)
+        return
+
+    if args.memory_check:
+        result = measure_memory(args)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"meta": {"git_commit": _git_commit(), "versions": _versions()}, **result}, f, indent=2)
+        if not check_memory(result, args.memory_ceiling_mb, args.keywords_ceiling_mb):
+            sys.exit(1)
+        return
+
+    results = run_benchmark(args)
+    for record in results["stages"]:
+        mem = f", peak RSS +{record['rss_delta_mb']:.1f} MB" if "rss_delta_mb" in record else ""
+        print(f"{_stage_key(record):<32} {record['wall_s']:8.3f}s wall, {record['cpu_s']:8.3f}s cpu{mem}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved benchmark results to: {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare_results(baseline, results, threshold=args.threshold):
+            print(f"Regression: at least one stage is more than {args.threshold:.0%} slower than the baseline.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+cluster_service.py
+
+Local HTTP service that keeps saved model bundles loaded and labels texts on request.
+
+Each model gets a micro-batcher thread: concurrent /predict requests are queued and
+combined into one preprocess + transform + predict call (up to --max_batch texts, waiting
+at most --max_wait_ms for more to arrive), then each caller gets its own slice back.
+
+Endpoints:
+  POST /predict  {"text": "..."} or {"texts": [...]}, optional "model": name
+  GET  /models   loaded models, their clusters and preprocessing
+  GET  /stats    per-model request/text counts, batch sizes, latency percentiles, throughput
+  GET  /health   liveness
+
+Usage examples:
+  python cluster_tool.py serve --model tickets=tickets_model.joblib --port 8765
+  curl -s localhost:8765/predict -d '{"texts": ["printer is offline", "reset my password"]}'
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from cluster_tool import DEFAULT_NORMALIZERS, load_model_bundle, predict_labels, preprocess_texts
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_WAIT_MS = 5.0
+# Largest accepted request body
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Latencies kept per model for the /stats percentiles
+LATENCY_WINDOW = 10000
+
+
+class LatencyStats:
+    """Thread-safe request counters plus a sliding window of latencies."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.predict_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record_request(self, n_texts: int, seconds: float, ok: bool = True):
+        with self.lock:
+            self.requests += 1
+            self.texts += n_texts
+            self.errors += not ok
+            self.latencies.append(seconds)
+
+    def record_batch(self, n_texts: int, seconds: float):
+        with self.lock:
+            self.batches += 1
+            self.batched_texts += n_texts
+            self.predict_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            uptime = time.time() - self.started
+            stats = {
+                "requests": self.requests,
+                "texts": self.texts,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_texts": self.batched_texts / self.batches if self.batches else None,
+                "predict_seconds": self.predict_seconds,
+                "uptime_seconds": uptime,
+                "texts_per_second": self.texts / uptime if uptime > 0 else None,
+            }
+        for pct in (50, 95, 99):
+            value = latencies[min(len(latencies) - 1, len(latencies) * pct // 100)] if latencies else None
+            stats[f"p{pct}_ms"] = None if value is None else value * 1000
+        return stats
+
+
+class MicroBatcher:
+    """Serves predict calls for one bundle from a single worker thread.
+
+    submit() queues the texts and blocks until the worker has labelled them. The worker takes
+    the oldest request, keeps collecting queued requests until max_batch texts or max_wait_ms
+    have passed, and labels the whole batch with one predict_labels call.
+    """
+
+    def __init__(self, bundle: dict, max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.bundle = bundle
+        self.normalizers = bundle.get("normalizers", DEFAULT_NORMALIZERS)
+        self.cluster_names = bundle.get("cluster_names", {})
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.stats = LatencyStats()
+        self.queue: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, texts: List[str]) -> Tuple[List[int], List[str]]:
+        """Labels and cluster names for texts (raw, not yet preprocessed)."""
+        start = time.perf_counter()
+        future: Future = Future()
+        self.queue.put((list(texts), future))
+        try:
+            labels = future.result()
+        except Exception:
+            self.stats.record_request(len(texts), time.perf_counter() - start, ok=False)
+            raise
+        self.stats.record_request(len(texts), time.perf_counter() - start)
+        return labels, [self.cluster_names.get(label, "") for label in labels]
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def _collect(self, first) -> list:
+        batch, n_texts = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_texts < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)  # stop after this batch
+                break
+            batch.append(item)
+            n_texts += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            start = time.perf_counter()
+            try:
+                labels = predict_labels(self.bundle, preprocess_texts(texts, normalizers=self.normalizers)) if texts else []
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats.record_batch(len(texts), time.perf_counter() - start)
+            pos = 0
+            for item_texts, future in batch:
+                future.set_result([int(l) for l in labels[pos : pos + len(item_texts)]])
+                pos += len(item_texts)
+
+
+class ClusterService:
+    """Loaded bundles by name, each with its own MicroBatcher. The first model is the default."""
+
+    def __init__(self, models: Dict[str, str], max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        if not models:
+            raise ValueError("No models to serve")
+        self.paths = dict(models)
+        self.default = next(iter(models))
+        self.batchers: Dict[str, MicroBatcher] = {}
+        for name, path in models.items():
+            start = time.perf_counter()
+            self.batchers[name] = MicroBatcher(load_model_bundle(path), max_batch=max_batch, max_wait_ms=max_wait_ms)
+            print(f"Loaded model '{name}' from {path} in {time.perf_counter() - start:.2f}s")
+
+    def predict(self, texts: List[str], model: Optional[str] = None) -> dict:
+        name = model or self.default
+        if name not in self.batchers:
+            raise KeyError(name)
+        labels, names = self.batchers[name].submit(texts)
+        return {"model": name, "labels": labels, "names": names}
+
+    def models(self) -> dict:
+        info = {}
+        for name, batcher in self.batchers.items():
+            bundle = batcher.bundle
+            info[name] = {
+                "path": self.paths[name],
+                "default": name == self.default,
+                "model": getattr(bundle["model"], "source", None) or type(bundle["model"]).__name__,
+                "lsa": "reducer" in bundle,
+                "normalizers": list(batcher.normalizers),
+                "cluster_names": {str(k): v for k, v in batcher.cluster_names.items()},
+            }
+        return info
+
+    def stats(self) -> dict:
+        return {name: batcher.stats.snapshot() for name, batcher in self.batchers.items()}
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP for ClusterService; the server object carries .service and .access_log."""
+
+    server_version = "TextAnalyzerPro"
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service: ClusterService = self.server.service
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            self._send(200, {"status": "ok", "models": list(service.batchers)})
+        elif path == "/models":
+            self._send(200, service.models())
+        elif path == "/stats":
+            self._send(200, service.stats())
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path.split("?", 1)[0].rstrip("/") != "/predict":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._send(413, {"error": f"Request body over {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            texts = [request["text"]] if "text" in request else request["texts"]
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                raise ValueError("'texts' must be a list of strings")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send(400, {"error": f"Expected JSON {{'text': str}} or {{'texts': [str, ...]}}: {e}"})
+            return
+        model = request.get("model")
+        if not isinstance(model, (str, type(None))):
+            self._send(400, {"error": f"'model' must be a model name, got {type(model).__name__}"})
+            return
+        try:
+            self._send(200, self.server.service.predict(texts, model=model))
+        except KeyError as e:
+            self._send(404, {"error": f"Unknown model {e}"})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default listen backlog of 5 resets bursts of concurrent clients
+    request_queue_size = 256
+
+
+def make_server(
+    service: ClusterService, host: str = "127.0.0.1", port: int = DEFAULT_PORT, access_log: bool = False
+) -> ThreadingHTTPServer:
+    """HTTP server bound to host:port (port 0 picks a free one); call serve_forever() to run it."""
+    server = ServiceServer((host, port), ServiceHandler)
+    server.service = service
+    server.access_log = access_log
+    return server
+
+
+def parse_model_specs(specs: List[str]) -> Dict[str, str]:
+    """'name=path' or 'path' (named after the file) -> {name: path}, in the given order."""
+    models = {}
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep:
+            path = spec
+            name = os.path.splitext(os.path.basename(os.path.normpath(spec)))[0]
+        if name in models:
+            raise ValueError(f"Model name '{name}' is used twice")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model bundle not found: {path}")
+        models[name] = path
+    return models
+
+
+def build_serve_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cluster_tool.py serve",
+        description="Keep saved models loaded and label texts over HTTP, micro-batching concurrent requests.",
+    )
+    parser.add_argument(
+        "--model",
+        "-m",
+        action="append",
+        required=True,
+        help="Model bundle as NAME=PATH or PATH (repeatable; the first one is the default)",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: localhost only)")
+    parser.add_argument("--port", "-p", type=int, default=DEFAULT_PORT, help="Port to listen on (0 = any free port)")
+    parser.add_argument("--max_batch", type=int, default=DEFAULT_MAX_BATCH, help="Most texts combined into one predict call")
+    parser.add_argument(
+        "--max_wait_ms", type=float, default=DEFAULT_MAX_WAIT_MS, help="How long a batch waits for more requests to join"
+    )
+    parser.add_argument("--access_log", action="store_true", help="Log every request to stderr")
+    return parser
+
+
+def serve_main(argv: Optional[List[str]] = None):
+    parser = build_serve_parser()
+    args = parser.parse_args(argv)
+    try:
+        models = parse_model_specs(args.model)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+    service = ClusterService(models, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    server = make_server(service, args.host, args.port, access_log=args.access_log)
+    host, port = server.server_address[:2]
+    print(f"Serving {', '.join(models)} on http://{host}:{port} (POST /predict, GET /models /stats /health)")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    serve_main()
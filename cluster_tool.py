@@ -2,37 +2,57 @@
 """
 cluster_tool.py
 
-A CLI tool to cluster text data from an Excel file and write cluster labels back to Excel.
+A CLI tool to cluster text data from an Excel, CSV or Parquet file and write cluster labels back to Excel.
 
 Features:
-- Load Excel file and allow user to choose a text column
+- Load Excel, CSV or Parquet input and allow user to choose a text column
+- Stream only the chosen text column in chunks (openpyxl read-only mode for .xlsx)
 - Preprocessing: lowercasing, basic normalization (non-string -> string), drop/handle missing
-- TF-IDF vectorization (with sklearn, english stop words)
-- Clustering: KMeans, DBSCAN, Agglomerative
-- Optional visualization (PCA or t-SNE)
+- TF-IDF vectorization (with sklearn, english stop words), optionally reduced with LSA (--lsa)
+- Clustering: KMeans (full-batch, mini-batch or out-of-core streaming), DBSCAN/HDBSCAN (exact cosine, or SVD + nearest-neighbour index), Agglomerative (exact, or SVD + knn-graph for large inputs)
+- Optional visualization (sparse SVD or t-SNE on a stratified sample)
 - Top keywords per cluster summary
-- Save trained model (joblib)
+- Save trained model (joblib, or a compact memory-mapped directory) and apply it to new files with `predict`
+- Run many files/sheets/columns/parameter sets from one manifest with `batch`
+- Label only new or changed rows of an append-only file with `incremental`, refitting on growth or drift
+- Keep saved models loaded in a local HTTP service with `serve` (micro-batched predict, latency stats)
 
 Usage examples:
   python cluster_tool.py --input data.xlsx --column comments --algorithm kmeans --n_clusters 5 --output clustered.xlsx
+  python cluster_tool.py predict --model clustered_model.joblib --input new_week.xlsx --column comments
+  python cluster_tool.py --input data.xlsx --column comments --save_model --model_format compact
+  python cluster_tool.py batch --manifest jobs.json --jobs 4 --report report.json
+  python cluster_tool.py incremental --model clustered_model.joblib --input data.xlsx
+  python cluster_tool.py serve --model tickets=clustered_model.joblib --port 8765
 """
 
+from __future__ import annotations
+
 import argparse
+import hashlib
+import io
+import json
 import os
-from typing import List, Optional, Tuple, Dict
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
-from sklearn.decomposition import PCA
-from sklearn.manifold import TSNE
-import matplotlib.pyplot as plt
-import seaborn as sns
-import joblib
+# pandas, numpy, scipy, sklearn, matplotlib, seaborn and joblib are imported inside the functions
+# that use them, so `--help`, the GUI window and KMeans-only runs don't pay for the rest at startup.
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 
 
 def load_excel(path: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    import pandas as pd
+
     # pandas.read_excel(..., sheet_name=None) returns a dict of DataFrames.
     # If sheet_name is None (user didn't specify), call read_excel without the
     # sheet_name parameter so pandas returns the first sheet as a DataFrame.
@@ -41,71 +61,1201 @@ def load_excel(path: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
     return pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl")
 
 
+DEFAULT_CHUNKSIZE = 50000
+
+
+def detect_input_format(path: str) -> str:
+    """Map a file extension to one of 'xlsx', 'xls', 'csv' or 'parquet'."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        return "xlsx"
+    if ext == ".xls":
+        return "xls"
+    if ext in (".csv", ".tsv", ".txt"):
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported input format '{ext}'. Use .xlsx, .xls, .csv or .parquet")
+
+
+def _csv_sep(path: str) -> str:
+    return "\t" if path.lower().endswith(".tsv") else ","
+
+
+def _parquet_file(path: str):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)") from e
+    return pq.ParquetFile(path)
+
+
+def _resolve_sheet(workbook, sheet_name):
+    # Accept a sheet name, or an index given as int or digit string (as passed from the CLI)
+    if sheet_name is None:
+        return workbook.worksheets[0]
+    if sheet_name in workbook.sheetnames:
+        return workbook[sheet_name]
+    if isinstance(sheet_name, int) or str(sheet_name).isdigit():
+        return workbook.worksheets[int(sheet_name)]
+    raise ValueError(f"Sheet '{sheet_name}' not found. Available sheets: {workbook.sheetnames}")
+
+
+def _is_empty_row(row) -> bool:
+    return all(v is None or v == "" for v in row)
+
+
+def _xlsx_rows(path: str, sheet_name=None) -> Iterator[tuple]:
+    """Stream worksheet rows as value tuples using openpyxl's read-only mode.
+
+    Fully empty rows are skipped, which matches what pandas.read_excel returns,
+    so row positions line up with a DataFrame loaded from the same sheet.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = _resolve_sheet(workbook, sheet_name)
+        for row in worksheet.iter_rows(values_only=True):
+            if not _is_empty_row(row):
+                yield row
+    finally:
+        workbook.close()
+
+
+def _header_names(raw_header) -> list:
+    # Mirror pandas naming: blank headers become 'Unnamed: i', duplicates get '.n' suffixes
+    names, seen = [], {}
+    for i, value in enumerate(raw_header):
+        name = f"Unnamed: {i}" if value is None or value == "" else value
+        key = str(name)
+        if key in seen:
+            seen[key] += 1
+            name = f"{key}.{seen[key]}"
+        else:
+            seen[key] = 0
+        names.append(name)
+    return names
+
+
+def _column_position(columns: list, column) -> int:
+    for i, c in enumerate(columns):
+        if c == column or str(c) == str(column):
+            return i
+    raise ValueError(f"Column '{column}' not found. Available columns: {list(columns)}")
+
+
+def _pandas_sheet_name(path: str, sheet_name):
+    # pandas treats "0" as a sheet called "0"; fall back to a positional index when no such sheet exists
+    if sheet_name is None:
+        return 0
+    if isinstance(sheet_name, str) and sheet_name.isdigit() and sheet_name not in list_sheets(path):
+        return int(sheet_name)
+    return sheet_name
+
+
+def list_sheets(path: str) -> List[str]:
+    """Sheet names of an Excel workbook; CSV and Parquet inputs have none."""
+    import pandas as pd
+
+    fmt = detect_input_format(path)
+    if fmt == "xlsx":
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    if fmt == "xls":
+        return [str(s) for s in pd.ExcelFile(path).sheet_names]
+    return []
+
+
+def read_columns(path: str, sheet_name: Optional[str] = None) -> list:
+    """Read only the header of the input and return its column names."""
+    import pandas as pd
+
+    fmt = detect_input_format(path)
+    if fmt == "csv":
+        return list(pd.read_csv(path, sep=_csv_sep(path), nrows=0).columns)
+    if fmt == "parquet":
+        return list(_parquet_file(path).schema_arrow.names)
+    if fmt == "xls":
+        return list(pd.read_excel(path, sheet_name=_pandas_sheet_name(path, sheet_name), nrows=0).columns)
+    for row in _xlsx_rows(path, sheet_name):
+        return _header_names(row)
+    return []
+
+
+def read_preview(path: str, sheet_name: Optional[str] = None, n_rows: int = 20) -> pd.DataFrame:
+    """Read the header and only the first n_rows data rows of the input."""
+    import pandas as pd
+
+    fmt = detect_input_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path, sep=_csv_sep(path), nrows=n_rows)
+    if fmt == "parquet":
+        pf = _parquet_file(path)
+        for batch in pf.iter_batches(batch_size=n_rows):
+            return batch.to_pandas()
+        return pd.DataFrame(columns=pf.schema_arrow.names)
+    if fmt == "xls":
+        return pd.read_excel(path, sheet_name=_pandas_sheet_name(path, sheet_name), nrows=n_rows)
+    rows = _xlsx_rows(path, sheet_name)
+    try:
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = _header_names(header)
+        data = []
+        for row in rows:
+            data.append((list(row) + [None] * len(columns))[: len(columns)])
+            if len(data) >= n_rows:
+                break
+    finally:
+        rows.close()
+    return pd.DataFrame(data, columns=columns)
+
+
+def iter_columns(
+    path: str, columns: List, sheet_name: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE, dtype=None
+) -> Iterator[pd.DataFrame]:
+    """Yield only the requested columns in DataFrame chunks, indexed by data row position.
+
+    All columns are read in the same pass over the file, so several text columns of one
+    workbook cost a single parse. dtype is passed to read_csv (CSV input only).
+    """
+    import pandas as pd
+
+    fmt = detect_input_format(path)
+    header = read_columns(path, sheet_name)
+    positions = [_column_position(header, c) for c in columns]
+    names = [header[p] for p in positions]
+    if fmt == "csv":
+        for chunk in pd.read_csv(path, sep=_csv_sep(path), usecols=names, chunksize=chunksize, dtype=dtype):
+            yield chunk[names]
+    elif fmt == "parquet":
+        start = 0
+        for batch in _parquet_file(path).iter_batches(batch_size=chunksize, columns=names):
+            frame = batch.to_pandas()[names]
+            frame.index = pd.RangeIndex(start, start + len(frame))
+            start += len(frame)
+            yield frame
+    elif fmt == "xls":
+        yield pd.read_excel(path, sheet_name=_pandas_sheet_name(path, sheet_name), usecols=names)[names]
+    else:
+        rows = _xlsx_rows(path, sheet_name)
+        next(rows, None)  # header
+
+        def frame(values, start):
+            data = {name: pd.Series(col, dtype=object) for name, col in zip(names, values)}
+            result = pd.DataFrame(data, columns=names)
+            result.index = pd.RangeIndex(start, start + len(values[0]))
+            return result
+
+        start, values = 0, [[] for _ in names]
+        for row in rows:
+            for col, pos in zip(values, positions):
+                col.append(row[pos] if pos < len(row) else None)
+            if len(values[0]) >= chunksize:
+                yield frame(values, start)
+                start += len(values[0])
+                values = [[] for _ in names]
+        if values[0] or start == 0:
+            yield frame(values, start)
+
+
+def iter_text_column(
+    path: str, column, sheet_name: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE, dtype=None
+) -> Iterator[pd.Series]:
+    """Yield the requested column in chunks, indexed by data row position.
+
+    Only that one column is ever materialized, so memory and time scale with the
+    text column rather than with the whole workbook.
+    """
+    for chunk in iter_columns(path, [column], sheet_name=sheet_name, chunksize=chunksize, dtype=dtype):
+        yield chunk.iloc[:, 0]
+
+
+def load_text_column(
+    path: str, column, sheet_name: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE
+) -> pd.Series:
+    """Load a single text column from an Excel, CSV or Parquet file."""
+    import pandas as pd
+
+    return pd.concat(list(iter_text_column(path, column, sheet_name=sheet_name, chunksize=chunksize)))
+
+
+def load_text_columns(
+    path: str, columns: List, sheet_name: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE
+) -> Dict[object, pd.Series]:
+    """Load several text columns in one pass; returns {requested column: Series}."""
+    import pandas as pd
+
+    columns = list(dict.fromkeys(columns))
+    frame = pd.concat(list(iter_columns(path, columns, sheet_name=sheet_name, chunksize=chunksize)))
+    return {column: frame.iloc[:, i] for i, column in enumerate(columns)}
+
+
+def load_table(path: str, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    """Load the whole input table (all columns) from an Excel, CSV or Parquet file."""
+    import pandas as pd
+
+    fmt = detect_input_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path, sep=_csv_sep(path))
+    if fmt == "parquet":
+        _parquet_file(path)  # clear error if pyarrow is missing
+        return pd.read_parquet(path)
+    return load_excel(path, sheet_name=_pandas_sheet_name(path, sheet_name))
+
+
 def coerce_text_column(series: pd.Series) -> pd.Series:
     # Convert to string, preserving NaN as empty strings
+    import pandas as pd
+
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return series.fillna("")  # already text: skip the per-element str() pass
     return series.fillna("").astype(str)
 
 
-def preprocess_texts(texts: List[str]) -> List[str]:
-    # Basic preprocessing: lowercase and strip
-    processed = [t.lower().strip() for t in texts]
-    return processed
+_URL_PATTERN = r"(?:https?://|www\.)\S+"
+_EMAIL_PATTERN = r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"
+_NUMBER_PATTERN = r"\b\d+(?:[.,]\d+)*\b"
+
+
+def _stem_series(series: pd.Series) -> pd.Series:
+    try:
+        from nltk.stem.snowball import SnowballStemmer
+    except ImportError as e:
+        raise ImportError("The 'stem' normalizer requires nltk (pip install nltk)") from e
+    import functools
+
+    stem = functools.lru_cache(maxsize=200000)(SnowballStemmer("english").stem)
+    return series.map(lambda t: " ".join(stem(w) for w in t.split()))
+
+
+# Each normalizer maps a Series of str to a Series of str using pandas string ops where possible.
+# Masked URLs, emails and numbers become single placeholder tokens so they still count as features.
+NORMALIZERS: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    "lower": lambda s: s.str.lower(),
+    "strip": lambda s: s.str.strip(),
+    "nfkc": lambda s: s.str.normalize("NFKC"),
+    "urls": lambda s: s.str.replace(_URL_PATTERN, " urltoken ", regex=True),
+    "emails": lambda s: s.str.replace(_EMAIL_PATTERN, " emailtoken ", regex=True),
+    "numbers": lambda s: s.str.replace(_NUMBER_PATTERN, " numtoken ", regex=True),
+    "whitespace": lambda s: s.str.replace(r"\s+", " ", regex=True).str.strip(),
+    "stem": _stem_series,
+}
+# Normalizers slow enough per row that fanning chunks out to worker processes pays off
+EXPENSIVE_NORMALIZERS = ("stem",)
+DEFAULT_NORMALIZERS = ("lower", "strip")
+PREPROCESS_CHUNKSIZE = 50000
+
+
+def parse_normalizers(spec) -> Tuple[str, ...]:
+    """'lower,urls,whitespace' (or a list of names) -> validated tuple of normalizer names."""
+    names = [n.strip() for n in spec.split(",")] if isinstance(spec, str) else list(spec)
+    names = tuple(n for n in names if n)
+    unknown = [n for n in names if n not in NORMALIZERS]
+    if unknown:
+        raise ValueError(f"Unknown normalizer(s) {', '.join(unknown)}; choose from {', '.join(NORMALIZERS)}")
+    return names
+
+
+def _normalize_series(series: pd.Series, normalizers: Tuple[str, ...]) -> pd.Series:
+    for name in normalizers:
+        series = NORMALIZERS[name](series)
+    return series
+
+
+def preprocess_texts(
+    texts, normalizers=DEFAULT_NORMALIZERS, n_jobs: int = 1, chunksize: int = PREPROCESS_CHUNKSIZE
+) -> List[str]:
+    """Apply the normalizers in order and return a list of strings.
+
+    Cheap normalizers run as vectorized pandas string ops in this process. When an expensive
+    one (stemming) is requested and n_jobs != 1, the texts are split into chunks of chunksize
+    and the whole pipeline runs on each chunk in a joblib process pool.
+    """
+    import pandas as pd
+
+    normalizers = parse_normalizers(normalizers)
+    series = texts if isinstance(texts, pd.Series) else pd.Series(texts, dtype=object)
+    series = series.reset_index(drop=True)
+    if n_jobs != 1 and len(series) > chunksize and any(n in EXPENSIVE_NORMALIZERS for n in normalizers):
+        import joblib
+
+        chunks = [series.iloc[i : i + chunksize] for i in range(0, len(series), chunksize)]
+        parts = joblib.Parallel(n_jobs=n_jobs)(joblib.delayed(_normalize_series)(c, normalizers) for c in chunks)
+        return [t for part in parts for t in part.tolist()]
+    return _normalize_series(series, normalizers).tolist()
+
+
+DEDUPE_MODES = ("none", "exact", "near")
+_MINHASH_PRIME = (1 << 31) - 1
+
+
+def _lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    # (bands, rows) whose S-curve midpoint (1 / bands) ** (1 / rows) is closest to threshold
+    pairs = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(pairs, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def minhash_signatures(texts: List[str], num_perm: int = 64, random_state: int = 42) -> np.ndarray:
+    """(n_texts x num_perm) MinHash signatures over word unigram and bigram shingles."""
+    import zlib
+
+    import numpy as np
+
+    hashes, lengths = [], []
+    for text in texts:
+        words = text.split()
+        shingles = set(words) | {a + " " + b for a, b in zip(words, words[1:])} or {""}
+        hashes.extend(zlib.crc32(sh.encode("utf-8")) & _MINHASH_PRIME for sh in shingles)
+        lengths.append(len(shingles))
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.intp)
+    rng = np.random.RandomState(random_state)
+    a = rng.randint(1, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for i in range(num_perm):
+        # a, x < 2^31 so a * x + b fits in uint64; the minimum per text is its MinHash value
+        signatures[:, i] = np.minimum.reduceat((a[i] * hashes + b[i]) % _MINHASH_PRIME, starts)
+    return signatures
+
+
+def _near_duplicate_groups(texts: List[str], threshold: float, num_perm: int, random_state: int) -> np.ndarray:
+    """Component id per text, joining texts whose estimated Jaccard similarity reaches threshold."""
+    import numpy as np
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import connected_components
+
+    n = len(texts)
+    signatures = minhash_signatures(texts, num_perm=num_perm, random_state=random_state)
+    bands, rows = _lsh_bands(num_perm, threshold)
+    left, right = [], []
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        _, first, bucket = np.unique(block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel(), return_index=True, return_inverse=True)
+        leader = first[bucket]
+        candidates = np.flatnonzero(leader != np.arange(n))
+        # Confirm LSH candidates against the bucket leader with the full signature
+        agree = (signatures[candidates] == signatures[leader[candidates]]).mean(axis=1) >= threshold
+        left.append(candidates[agree])
+        right.append(leader[candidates[agree]])
+    left, right = np.concatenate(left), np.concatenate(right)
+    graph = sp.coo_matrix((np.ones(len(left), dtype=np.int8), (left, right)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
 
+def dedupe_texts(
+    texts: List[str], mode: str = "exact", threshold: float = 0.8, num_perm: int = 64, random_state: int = 42
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Collapse duplicate texts to one representative each.
 
-def vectorize_texts(texts: List[str], max_features: Optional[int] = 2000) -> Tuple[TfidfVectorizer, np.ndarray]:
-    vectorizer = TfidfVectorizer(stop_words="english", max_features=max_features)
+    Returns (representatives, inverse, counts): row i is represented by representatives[inverse[i]]
+    and counts[j] rows map to representative j, so counts can be used as sample weights and
+    labels[inverse] broadcasts labels of the representatives back to every row.
+    mode="exact" merges identical strings. mode="near" also merges texts whose MinHash-estimated
+    Jaccard similarity over word 1-2 grams reaches threshold; groups are connected components of
+    LSH-confirmed pairs, represented by their most frequent member.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if mode not in DEDUPE_MODES:
+        raise ValueError(f"Unknown dedupe mode '{mode}'; choose from {', '.join(DEDUPE_MODES)}")
+    if mode == "none":
+        return list(texts), np.arange(len(texts)), np.ones(len(texts), dtype=np.int64)
+    inverse, uniques = pd.factorize(pd.Series(texts, dtype=object), sort=False)
+    representatives = list(uniques)
+    counts = np.bincount(inverse, minlength=len(representatives))
+    if mode == "near" and len(representatives) > 1:
+        groups = _near_duplicate_groups(representatives, threshold, num_perm, random_state)
+        # Most frequent member of each group (ties: first seen) becomes its representative
+        order = np.lexsort((np.arange(len(groups)), -counts, groups))
+        is_first = np.r_[True, groups[order][1:] != groups[order][:-1]]
+        leaders = order[is_first]
+        group_index = np.empty(groups.max() + 1, dtype=np.intp)
+        group_index[groups[leaders]] = np.arange(len(leaders))
+        inverse = group_index[groups[inverse]]
+        representatives = [representatives[i] for i in leaders]
+        counts = np.bincount(inverse, minlength=len(representatives))
+    return representatives, np.asarray(inverse), counts
+
+
+# Numeric precision of TF-IDF matrices, SVD embeddings and centroids. float32 halves memory and
+# bandwidth; TF-IDF weights carry far less information than float32 resolves.
+DTYPES = ("float32", "float64")
+DEFAULT_DTYPE = "float64"
+
+
+# Below this many texts vectorize_texts stays serial: worker start-up costs more than it saves
+PARALLEL_VECTORIZE_MIN_ROWS = 100000
+
+
+def vectorize_texts(
+    texts: List[str], max_features: Optional[int] = 2000, dtype: str = DEFAULT_DTYPE, n_jobs: int = 1
+) -> Tuple[TfidfVectorizer, np.ndarray]:
+    """Fit a TF-IDF vectorizer (english stop words) and return (vectorizer, X).
+
+    With n_jobs != 1 and at least PARALLEL_VECTORIZE_MIN_ROWS texts, tokenizing and counting
+    run in worker processes (see _vectorize_sharded); the result is the same as the serial fit.
+    """
+    import numpy as np
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    n_workers = joblib.effective_n_jobs(n_jobs)
+    if n_workers > 1 and len(texts) >= PARALLEL_VECTORIZE_MIN_ROWS:
+        return _vectorize_sharded(texts, max_features=max_features, dtype=dtype, n_jobs=n_workers)
+    vectorizer = TfidfVectorizer(stop_words="english", max_features=max_features, dtype=np.dtype(dtype).type)
     X = vectorizer.fit_transform(texts)
     return vectorizer, X
 
 
+def _count_shard(texts: List[str]):
+    """Worker: (terms, counts) for one shard; terms in column order, counts an int64 CSR matrix."""
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    vectorizer = CountVectorizer(stop_words="english", dtype=np.int64)
+    try:
+        counts = vectorizer.fit_transform(texts)
+    except ValueError:  # only stop words (or nothing) in this shard
+        return np.array([], dtype=object), sp.csr_matrix((len(texts), 0), dtype=np.int64)
+    return vectorizer.get_feature_names_out(), counts.tocsr()
+
+
+def _vectorize_sharded(texts: List[str], max_features: Optional[int], dtype: str, n_jobs: int):
+    """Parallel equivalent of TfidfVectorizer(stop_words="english", max_features=...).fit_transform.
+
+    Each worker counts one contiguous shard with its own vocabulary. The parent merges the
+    vocabularies, sums term and document frequencies, and picks the max_features terms with
+    the same alphabetical ordering and argsort that CountVectorizer uses, so the vocabulary
+    and matrix match the serial fit. Shard matrices are copied once, into the final CSR arrays.
+    """
+    import numpy as np
+    import scipy.sparse as sp
+    import joblib
+    from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer
+
+    step = -(-len(texts) // n_jobs)
+    shards = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_count_shard)(texts[i : i + step]) for i in range(0, len(texts), step)
+    )
+
+    # Global vocabulary in alphabetical order, as CountVectorizer._sort_features leaves it
+    terms = np.unique(np.concatenate([np.asarray(names, dtype=object) for names, _ in shards]).astype(str))
+    if len(terms) == 0:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+    maps = [np.searchsorted(terms, np.asarray(names, dtype=str)) for names, _ in shards]
+    tfs = np.zeros(len(terms), dtype=np.int64)
+    for (_, counts), cols in zip(shards, maps):
+        tfs[cols] += np.asarray(counts.sum(axis=0)).ravel()
+
+    # CountVectorizer._limit_features with the default min_df/max_df: only max_features prunes.
+    # Its term frequencies are sums of the dtype count matrix, so rank with that dtype for identical ties.
+    keep = np.ones(len(terms), dtype=bool)
+    if max_features is not None and len(terms) > max_features:
+        sum_dtype = sp.csr_matrix((1, 1), dtype=np.dtype(dtype)).sum(axis=0).dtype
+        keep[:] = False
+        keep[(-tfs.astype(sum_dtype)).argsort()[:max_features]] = True
+    new_index = np.where(keep, np.cumsum(keep) - 1, -1)
+
+    # The serial fit numbers terms by first occurrence and keeps every row's entries in that order
+    # after renaming columns alphabetically. The L2 row norms are summed in entry order, so replay
+    # it to get bit-identical float64 values. A shard's first-occurrence order is the order in
+    # which its columns first appear in its CSR storage.
+    first_seen = np.full(len(terms), -1, dtype=np.int64)
+    n_seen = 0
+    for (_, counts), cols in zip(shards, maps):
+        _, first_pos = np.unique(counts.indices, return_index=True)
+        ordered = cols[np.argsort(first_pos)]
+        new = ordered[first_seen[ordered] < 0]
+        first_seen[new] = n_seen + np.arange(len(new))
+        n_seen += len(new)
+    new_index_by_rank = np.empty(len(terms), dtype=np.int64)
+    new_index_by_rank[first_seen] = new_index
+
+    # Assemble the pruned count matrix once: per shard, rank columns and copy the kept entries
+    nnz, row_counts = 0, []
+    for (_, counts), cols in zip(shards, maps):
+        kept = keep[cols][counts.indices]
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        row_counts.append(np.bincount(rows[kept], minlength=counts.shape[0]))
+        nnz += int(kept.sum())
+    index_dtype = np.int64 if max(nnz, len(terms)) > np.iinfo(np.int32).max else np.int32
+    data = np.empty(nnz, dtype=np.dtype(dtype))
+    indices = np.empty(nnz, dtype=index_dtype)
+    indptr = np.concatenate([[0], np.cumsum(np.concatenate(row_counts))]).astype(index_dtype)
+    pos = 0
+    for (_, counts), cols in zip(shards, maps):
+        kept = keep[cols][counts.indices]
+        n = int(kept.sum())
+        data[pos : pos + n] = counts.data[kept]
+        indices[pos : pos + n] = first_seen[cols][counts.indices[kept]]
+        pos += n
+    del shards
+    counts = sp.csr_matrix((data, indices, indptr), shape=(len(texts), len(terms)), copy=False)
+    counts.sort_indices()
+    counts = sp.csr_matrix(
+        (counts.data, new_index_by_rank.take(counts.indices).astype(index_dtype), counts.indptr),
+        shape=(len(texts), int(keep.sum())),
+        copy=False,
+    )
+
+    tfidf = TfidfTransformer().fit(counts)
+    X = tfidf.transform(counts, copy=False)
+    vocabulary = {term: i for i, term in enumerate(terms[keep].tolist())}
+    vectorizer = TfidfVectorizer(
+        stop_words="english", max_features=max_features, dtype=np.dtype(dtype).type, vocabulary=vocabulary
+    )
+    vectorizer.idf_ = tfidf.idf_
+    return vectorizer, X
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "text_analyzer_pro")
+DEFAULT_CACHE_MAX_MB = 2048
+# Bump when preprocessing or vectorization changes in a way that invalidates cached matrices
+CACHE_FORMAT_VERSION = 2
+
+
+class TfidfCache:
+    """On-disk cache of fitted vectorizers and their TF-IDF matrices.
+
+    Entries are keyed on a hash of the raw column contents plus every setting that affects
+    preprocessing or vectorization, so re-running with only clustering parameters changed
+    skips both steps. Each entry is a sparse .npz matrix plus a joblib-pickled vectorizer;
+    the least recently used entries are evicted once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(texts: pd.Series, **params) -> str:
+        import pandas as pd
+
+        h = hashlib.sha256()
+        h.update(json.dumps({"version": CACHE_FORMAT_VERSION, **params}, sort_keys=True, default=str).encode("utf-8"))
+        # Vectorized 64-bit row hashes, then one sha256 over them (order-sensitive)
+        h.update(pd.util.hash_pandas_object(pd.Series(texts), index=False).to_numpy().tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def vectorize_params(max_features: Optional[int], normalizers, dtype: str) -> dict:
+        """The settings every cache key must include; pass them to make_key as **params."""
+        return {
+            "max_features": max_features,
+            "normalizers": list(parse_normalizers(normalizers)),
+            "dtype": str(dtype),
+        }
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        return os.path.join(self.cache_dir, key + ".npz"), os.path.join(self.cache_dir, key + ".vocab.joblib")
+
+    def get(self, key: str):
+        """Return (vectorizer, X) for key, or None on a miss."""
+        import scipy.sparse as sp
+        import joblib
+
+        matrix_path, vocab_path = self._paths(key)
+        if not (os.path.exists(matrix_path) and os.path.exists(vocab_path)):
+            return None
+        try:
+            X = sp.load_npz(matrix_path).tocsr()
+            vectorizer = joblib.load(vocab_path)
+        except Exception:
+            # Corrupt or partially written entry: drop it and recompute
+            self._remove(key)
+            return None
+        for p in (matrix_path, vocab_path):
+            os.utime(p)  # mark as recently used
+        return vectorizer, X
+
+    def put(self, key: str, vectorizer, X):
+        import scipy.sparse as sp
+        import joblib
+
+        matrix_path, vocab_path = self._paths(key)
+        # stop_words_ only exists for introspection and can be very large
+        if hasattr(vectorizer, "stop_words_"):
+            vectorizer.stop_words_ = None
+        tmp_matrix, tmp_vocab = matrix_path + ".tmp.npz", vocab_path + ".tmp"
+        sp.save_npz(tmp_matrix, sp.csr_matrix(X), compressed=False)
+        joblib.dump(vectorizer, tmp_vocab)
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_vocab, vocab_path)
+        self.evict()
+
+    def _remove(self, key: str):
+        for p in self._paths(key):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp") or name.endswith(".tmp.npz"):
+                continue
+            key = name.split(".", 1)[0]
+            path = os.path.join(self.cache_dir, name)
+            size, mtime = entries.get(key, (0, 0.0))
+            st = os.stat(path)
+            entries[key] = (size + st.st_size, max(mtime, st.st_mtime))
+        total = sum(size for size, _ in entries.values())
+        for key, (size, _) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+
+def _reduce_svd(X, n_components: int = 100, random_state: int = 42) -> np.ndarray:
+    """Truncated SVD (works directly on sparse input) followed by L2 row normalization."""
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.preprocessing import normalize
+
+    import scipy.sparse as sp
+
+    if not sp.issparse(X) and X.shape[1] <= n_components:
+        # already reduced and normalized (e.g. by --lsa)
+        return X
+    n_components = max(1, min(n_components, X.shape[1] - 1, X.shape[0] - 1))
+    svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+    # keep the input precision (float32 in, float32 out) for the knn index and clustering
+    return normalize(svd.fit_transform(X).astype(X.dtype, copy=False), copy=False)
+
+
+def fit_lsa(X, n_components: int = 100, random_state: int = 42):
+    """Latent semantic analysis: truncated SVD of the TF-IDF matrix, then L2 row normalization.
+
+    Returns (reducer, Z, explained_variance) where reducer is the fitted sklearn Pipeline
+    (kept in the model bundle so new texts are projected the same way), Z is the dense
+    (n_rows x n_components) embedding in X's dtype and explained_variance is the fraction
+    of TF-IDF variance the components retain.
+    """
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import Normalizer
+
+    n_components = max(1, min(n_components, X.shape[1] - 1, X.shape[0] - 1))
+    reducer = make_pipeline(TruncatedSVD(n_components=n_components, random_state=random_state), Normalizer(copy=False))
+    Z = reducer.fit_transform(X).astype(X.dtype, copy=False)
+    return reducer, Z, float(reducer[0].explained_variance_ratio_.sum())
+
+
+def lsa_from_components(components: np.ndarray):
+    """Rebuild a fitted fit_lsa() reducer from its SVD components (used by compact bundles)."""
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import Normalizer
+
+    svd = TruncatedSVD(n_components=components.shape[0])
+    svd.components_ = components
+    svd.n_features_in_ = components.shape[1]
+    return make_pipeline(svd, Normalizer(copy=False))
+
+
+# Above this many rows _knn_graph uses pynndescent's approximate index when it is installed
+ANN_MIN_ROWS = 50000
+# hdbscan's default min_cluster_size: at least this many rows, or one per mille of the input
+HDBSCAN_MIN_CLUSTER_SIZE = 15
+
+
+def _knn_graph(Z: np.ndarray, n_neighbors: int = 10, mode: str = "connectivity", random_state: int = 42):
+    """Sparse k-nearest-neighbour graph over the rows of Z (self excluded).
+
+    mode="distance" stores euclidean distances instead of ones.
+    """
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.neighbors import kneighbors_graph
+
+    n_neighbors = max(1, min(n_neighbors, Z.shape[0] - 1))
+    if Z.shape[0] >= ANN_MIN_ROWS:
+        try:
+            from pynndescent import NNDescent
+        except ImportError:
+            NNDescent = None
+        if NNDescent is not None:
+            indices, distances = NNDescent(Z, n_neighbors=n_neighbors + 1, random_state=random_state).neighbor_graph
+            rows = np.repeat(np.arange(Z.shape[0]), indices.shape[1])
+            cols, dists = indices.ravel(), distances.ravel()
+            keep = (cols >= 0) & (cols != rows)
+            data = dists[keep] if mode == "distance" else np.ones(keep.sum())
+            return sp.csr_matrix((data, (rows[keep], cols[keep])), shape=(Z.shape[0], Z.shape[0]))
+    return kneighbors_graph(Z, n_neighbors=n_neighbors, mode=mode, include_self=False)
+
+
+# Above this many rows the knn agglomerative path first compresses the data into micro-clusters
+AGGLOMERATIVE_DIRECT_MAX_ROWS = 20000
+
+
+def _cluster_agglomerative_knn(
+    X, n_clusters: int, n_components: int = 100, n_neighbors: int = 10, random_state: int = 42, sample_weight=None
+):
+    from sklearn.cluster import MiniBatchKMeans, AgglomerativeClustering
+
+    Z = _reduce_svd(X, n_components=n_components, random_state=random_state)
+    if Z.shape[0] <= AGGLOMERATIVE_DIRECT_MAX_ROWS:
+        # Ward linkage constrained to the knn graph: memory grows with n_rows * n_neighbors, not n_rows^2
+        model = AgglomerativeClustering(n_clusters=n_clusters, linkage="ward", connectivity=_knn_graph(Z, n_neighbors))
+        return model, model.fit_predict(Z)
+    # Two-stage: MiniBatchKMeans micro-clusters, then agglomerate their centres and broadcast back
+    n_micro = min(AGGLOMERATIVE_DIRECT_MAX_ROWS, max(20 * n_clusters, 2000))
+    micro = MiniBatchKMeans(n_clusters=n_micro, batch_size=4096, n_init=1, random_state=random_state)
+    micro.fit(Z, sample_weight=sample_weight)
+    centres = micro.cluster_centers_
+    model = AgglomerativeClustering(n_clusters=n_clusters, linkage="ward", connectivity=_knn_graph(centres, n_neighbors))
+    model.fit(centres)
+    return model, model.labels_[micro.labels_]
+
+
+def _make_hdbscan(min_samples: int, min_cluster_size: int):
+    try:
+        from sklearn.cluster import HDBSCAN
+    except ImportError:  # scikit-learn < 1.3
+        try:
+            from hdbscan import HDBSCAN
+        except ImportError as e:
+            raise ImportError("hdbscan needs scikit-learn >= 1.3 or the hdbscan package") from e
+    return HDBSCAN(min_cluster_size=max(2, min_cluster_size), min_samples=min_samples)
+
+
+def _cluster_density(
+    X,
+    algorithm: str,
+    eps: float,
+    min_samples: int,
+    n_components: int = 100,
+    n_neighbors: int = 10,
+    random_state: int = 42,
+    sample_weight=None,
+    min_cluster_size: Optional[int] = None,
+    exact_neighbors: bool = False,
+):
+    import numpy as np
+    from sklearn.cluster import DBSCAN
+    from sklearn.neighbors import radius_neighbors_graph
+
+    # Reduced, L2-normalized rows let tree/ANN indexes replace brute-force cosine distances
+    Z = _reduce_svd(X, n_components=n_components, random_state=random_state)
+    if algorithm == "hdbscan":
+        if min_cluster_size is None:
+            min_cluster_size = max(HDBSCAN_MIN_CLUSTER_SIZE, Z.shape[0] // 1000)
+        model = _make_hdbscan(min_samples, min_cluster_size)
+        return model, model.fit_predict(Z)
+    # For unit vectors euclidean = sqrt(2 * cosine distance), so --eps keeps its cosine meaning
+    radius = float(np.sqrt(2 * eps))
+    if exact_neighbors:
+        # Every pair within eps (brute force at SVD dimensionality): the same result as DBSCAN on Z,
+        # but the graph grows with the number of such pairs, i.e. up to quadratically in the rows
+        graph = radius_neighbors_graph(Z, radius, mode="distance")
+    else:
+        # At most n_neighbors (>= min_samples) edges per row keeps memory linear in the rows; core
+        # points are still exact. Symmetrizing keeps i-j connected when only i lists j, without
+        # which dense clusters fall apart into many small ones
+        graph = _knn_graph(Z, n_neighbors=max(n_neighbors, min_samples), mode="distance", random_state=random_state)
+        graph = graph.maximum(graph.T).tocsr()
+    model = DBSCAN(eps=radius, min_samples=min_samples, metric="precomputed")
+    return model, model.fit_predict(graph, sample_weight=sample_weight)
+
+
+# Default --eps per algorithm: dbscan_fast measures distances after SVD + L2 normalization,
+# where rows sit much closer together than in the raw TF-IDF space
+DBSCAN_EPS = 0.5
+DBSCAN_FAST_EPS = 0.3
+
+ALGORITHMS = ["kmeans", "minibatch_kmeans", "dbscan", "dbscan_fast", "hdbscan", "agglomerative", "agglomerative_knn"]
+# Algorithms that pick the number of clusters themselves and may label rows -1 (noise)
+DENSITY_ALGORITHMS = ("dbscan", "dbscan_fast", "hdbscan")
+
+
 def cluster_texts(
-    X, algorithm: str = "kmeans", n_clusters: int = 5, eps: float = 0.5, min_samples: int = 5, random_state: int = 42
+    X,
+    algorithm: str = "kmeans",
+    n_clusters: int = 5,
+    eps: Optional[float] = None,
+    min_samples: int = 5,
+    random_state: int = 42,
+    n_components: int = 100,
+    n_neighbors: int = 10,
+    batch_size: int = 1024,
+    sample_weight=None,
+    min_cluster_size: Optional[int] = None,
+    exact_neighbors: bool = False,
+    init="k-means++",
 ):
+    """Fit the chosen algorithm on X and return (model, labels).
+
+    sample_weight (e.g. duplicate counts from dedupe_texts) is honoured by kmeans,
+    minibatch_kmeans, dbscan, dbscan_fast and the micro-cluster stage of agglomerative_knn;
+    hdbscan and agglomerative treat every row once. init is passed to kmeans and
+    minibatch_kmeans; an array of starting centroids means a single run from exactly those.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, AgglomerativeClustering
+
     if algorithm == "kmeans":
-        model = KMeans(n_clusters=n_clusters, random_state=random_state)
-        labels = model.fit_predict(X)
+        model = KMeans(n_clusters=n_clusters, init=init, n_init="auto" if isinstance(init, str) else 1, random_state=random_state)
+        labels = model.fit_predict(X, sample_weight=sample_weight)
+    elif algorithm == "minibatch_kmeans":
+        model = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            batch_size=batch_size,
+            init=init,
+            n_init=3 if isinstance(init, str) else 1,
+            random_state=random_state,
+        )
+        labels = model.fit_predict(X, sample_weight=sample_weight)
     elif algorithm == "dbscan":
         # DBSCAN requires dense or sparse; works with sparse
-        model = DBSCAN(eps=eps, min_samples=min_samples, metric="cosine")
-        labels = model.fit_predict(X)
+        model = DBSCAN(eps=DBSCAN_EPS if eps is None else eps, min_samples=min_samples, metric="cosine")
+        labels = model.fit_predict(X, sample_weight=sample_weight)
+    elif algorithm in ("dbscan_fast", "hdbscan"):
+        model, labels = _cluster_density(
+            X,
+            algorithm,
+            DBSCAN_FAST_EPS if eps is None else eps,
+            min_samples,
+            n_components=n_components,
+            n_neighbors=n_neighbors,
+            random_state=random_state,
+            sample_weight=sample_weight,
+            min_cluster_size=min_cluster_size,
+            exact_neighbors=exact_neighbors,
+        )
     elif algorithm == "agglomerative":
         # AgglomerativeClustering does not accept sparse matrices -> densify
         model = AgglomerativeClustering(n_clusters=n_clusters)
-        labels = model.fit_predict(X.toarray())
+        labels = model.fit_predict(X.toarray() if hasattr(X, "toarray") else X)
+    elif algorithm == "agglomerative_knn":
+        # Scalable variant: SVD reduction + knn connectivity, never densifies X
+        model, labels = _cluster_agglomerative_knn(
+            X,
+            n_clusters,
+            n_components=n_components,
+            n_neighbors=n_neighbors,
+            random_state=random_state,
+            sample_weight=sample_weight,
+        )
     else:
         raise ValueError(f"Unknown algorithm: {algorithm}")
     return model, labels
 
 
-def get_top_keywords_per_cluster(
-    vectorizer: TfidfVectorizer, X, labels: np.ndarray, top_n: int = 10
+# Algorithms whose number of clusters is set by the caller and can therefore be swept
+SWEEP_ALGORITHMS = ("kmeans", "minibatch_kmeans", "agglomerative", "agglomerative_knn")
+SWEEP_METRICS = ("silhouette", "calinski_harabasz", "elbow")
+
+
+def parse_k_range(spec: str) -> List[int]:
+    """Parse 'MIN:MAX' or 'MIN:MAX:STEP' (inclusive) into a list of candidate k values."""
+    parts = [int(p) for p in str(spec).split(":")]
+    if len(parts) not in (2, 3) or parts[0] < 2 or parts[1] < parts[0]:
+        raise ValueError(f"Invalid k range '{spec}': expected MIN:MAX with 2 <= MIN <= MAX")
+    step = parts[2] if len(parts) == 3 else 1
+    return list(range(parts[0], parts[1] + 1, max(step, 1)))
+
+
+def _within_cluster_sse(X, labels: np.ndarray) -> float:
+    import numpy as np
+    import scipy.sparse as sp
+
+    # sum ||x - c||^2 = sum ||x||^2 - sum_c n_c ||c||^2, computed without densifying X
+    cluster_ids, centroids = _cluster_centroids(X, labels)
+    keep = np.asarray(labels) != -1
+    row_sq = np.asarray(X.multiply(X).sum(axis=1)).ravel() if sp.issparse(X) else (np.asarray(X) ** 2).sum(axis=1)
+    counts = np.bincount(np.searchsorted(cluster_ids, np.asarray(labels)[keep]), minlength=len(cluster_ids))
+    # accumulate in float64: float32 sums over many rows lose the small differences between k
+    return float(row_sq[keep].sum(dtype=np.float64) - (counts * (centroids ** 2).sum(axis=1, dtype=np.float64)).sum())
+
+
+def _evaluate_k(X, k: int, algorithm: str, sample_idx: np.ndarray, random_state: int, cluster_kwargs: dict) -> dict:
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.metrics import calinski_harabasz_score, silhouette_score
+
+    start = time.perf_counter()
+    _, labels = cluster_texts(X, algorithm=algorithm, n_clusters=k, random_state=random_state, **cluster_kwargs)
+    result = {"k": k, "fit_seconds": time.perf_counter() - start, "inertia": _within_cluster_sse(X, labels)}
+    sample_labels = labels[sample_idx]
+    result["silhouette"] = result["calinski_harabasz"] = None
+    if len(np.unique(sample_labels)) > 1:
+        Xs = X[sample_idx]
+        # Rows are L2-normalized, so euclidean silhouette ranks partitions like cosine would
+        result["silhouette"] = float(silhouette_score(Xs, sample_labels))
+        result["calinski_harabasz"] = float(
+            calinski_harabasz_score(Xs.toarray() if sp.issparse(Xs) else Xs, sample_labels)
+        )
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def sweep_k(
+    X,
+    k_values: List[int],
+    algorithm: str = "kmeans",
+    n_jobs: int = -1,
+    sample_size: int = 2000,
+    random_state: int = 42,
+    **cluster_kwargs,
+) -> List[dict]:
+    """Fit every candidate k in a process pool and score it.
+
+    X is dumped once to a temporary file and memory-mapped, so workers share a single
+    read-only copy of the CSR arrays instead of each receiving a pickled copy.
+    Silhouette and Calinski-Harabasz are computed on a random sample of sample_size rows;
+    inertia (within-cluster sum of squares) uses every row.
+    """
+    import numpy as np
+    import joblib
+
+    if algorithm not in SWEEP_ALGORITHMS:
+        raise ValueError(f"k sweep is only supported for {', '.join(SWEEP_ALGORITHMS)}")
+    if not k_values:
+        raise ValueError("No candidate k values to sweep")
+    candidates = [k for k in k_values if k < X.shape[0]]
+    if not candidates:
+        raise ValueError(
+            f"Every k in {min(k_values)}..{max(k_values)} needs more than the {X.shape[0]} rows available; "
+            f"use a range with MIN < {X.shape[0]}"
+        )
+    k_values = candidates
+    rng = np.random.RandomState(random_state)
+    sample_idx = np.sort(rng.choice(X.shape[0], min(sample_size, X.shape[0]), replace=False))
+    tmp_dir = tempfile.mkdtemp(prefix="text_analyzer_sweep_")
+    try:
+        shared_path = os.path.join(tmp_dir, "X.joblib")
+        joblib.dump(X, shared_path)
+        X_shared = joblib.load(shared_path, mmap_mode="r")
+        results = joblib.Parallel(n_jobs=n_jobs)(
+            joblib.delayed(_evaluate_k)(X_shared, k, algorithm, sample_idx, random_state, cluster_kwargs)
+            for k in k_values
+        )
+        del X_shared
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return sorted(results, key=lambda r: r["k"])
+
+
+def choose_best_k(results: List[dict], metric: str = "silhouette") -> int:
+    """Pick k: highest silhouette / Calinski-Harabasz, or the inertia elbow."""
+    import numpy as np
+
+    if not results:
+        raise ValueError("No k sweep results to choose from")
+    if metric == "elbow":
+        ks = np.array([r["k"] for r in results], dtype=float)
+        inertia = np.array([r["inertia"] for r in results], dtype=float)
+        if len(ks) < 3:
+            return int(ks[0])
+        # Knee: point farthest from the straight line joining the first and last (normalized) points
+        x = (ks - ks[0]) / (ks[-1] - ks[0])
+        span = inertia[0] - inertia[-1]
+        y = (inertia - inertia[-1]) / span if span > 0 else np.zeros_like(inertia)
+        return int(ks[np.argmax(np.abs(x + y - 1))])
+    scored = [r for r in results if r.get(metric) is not None]
+    if not scored:
+        raise ValueError(f"No candidate k produced a {metric} score")
+    return int(max(scored, key=lambda r: r[metric])["k"])
+
+
+def plot_k_sweep(results: List[dict], best_k: Optional[int] = None, out_path: Optional[str] = None):
+    """Plot silhouette, Calinski-Harabasz and inertia against k."""
+    import numpy as np
+    import matplotlib.pyplot as plt
+
+    ks = [r["k"] for r in results]
+    fig, axes = plt.subplots(1, 3, figsize=(13, 4))
+    panels = (
+        ("silhouette", "Silhouette (sampled)"),
+        ("calinski_harabasz", "Calinski-Harabasz (sampled)"),
+        ("inertia", "Inertia (elbow)"),
+    )
+    for ax, (key, title) in zip(axes, panels):
+        values = [np.nan if r.get(key) is None else r[key] for r in results]
+        ax.plot(ks, values, marker="o")
+        if best_k is not None:
+            ax.axvline(best_k, color="#cc3333", linestyle="--", linewidth=1)
+        ax.set_title(title)
+        ax.set_xlabel("k")
+    fig.tight_layout()
+    if out_path:
+        fig.savefig(out_path)
+        print(f"Saved k sweep plot to: {out_path}")
+    else:
+        plt.show()
+    plt.close(fig)
+
+
+def make_hashing_vectorizer(n_features: int = 2 ** 18, dtype: str = DEFAULT_DTYPE) -> HashingVectorizer:
+    import numpy as np
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    # Stateless vectorizer: chunks can be transformed without a vocabulary pass over the corpus
+    return HashingVectorizer(
+        stop_words="english", n_features=n_features, alternate_sign=False, norm="l2", dtype=np.dtype(dtype).type
+    )
+
+
+def hashed_feature_names(vectorizer: HashingVectorizer, texts: List[str]) -> np.ndarray:
+    """Best-effort term for each hashed column, taken from the tokens seen in a sample of texts.
+
+    When several terms share a bucket the most frequent one wins; unseen buckets are ''.
+    """
+    import numpy as np
+
+    analyzer = vectorizer.build_analyzer()
+    counts = Counter()
+    for t in texts:
+        counts.update(analyzer(t))
+    names = np.full(vectorizer.n_features, "", dtype=object)
+    if not counts:
+        return names
+    terms = sorted(counts, key=counts.get)
+    hashed = vectorizer.transform(terms).tocsr()
+    for term, start, end in zip(terms, hashed.indptr[:-1], hashed.indptr[1:]):
+        if end > start:
+            names[hashed.indices[start]] = term
+    return names
+
+
+def cluster_texts_streaming(
+    make_chunks: Callable[[], Iterable[List[str]]],
+    n_clusters: int = 5,
+    n_features: int = 2 ** 18,
+    batch_size: int = 1024,
+    random_state: int = 42,
+    name_sample: int = 20000,
+    dtype: str = DEFAULT_DTYPE,
+):
+    """Out-of-core MiniBatchKMeans over preprocessed text chunks.
+
+    make_chunks() must return a fresh iterable of text chunks on every call: the first
+    pass feeds partial_fit, the second assigns final labels and accumulates inertia.
+    Only one chunk (plus the centroids) is held in memory at a time.
+    Returns (vectorizer, model, labels, feature_names, stats).
+    """
+    import numpy as np
+    from sklearn.cluster import MiniBatchKMeans
+
+    vectorizer = make_hashing_vectorizer(n_features, dtype=dtype)
+    model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state)
+    # The first partial_fit call needs at least n_clusters rows to initialise the centroids
+    step = max(batch_size, 3 * n_clusters)
+    sample: List[str] = []
+    n_docs = 0
+    start = time.perf_counter()
+    for chunk in make_chunks():
+        if len(sample) < name_sample:
+            sample.extend(chunk[: name_sample - len(sample)])
+        Xc = vectorizer.transform(chunk)
+        for i in range(0, Xc.shape[0], step):
+            model.partial_fit(Xc[i : i + step])
+        n_docs += Xc.shape[0]
+    fit_seconds = time.perf_counter() - start
+
+    labels, inertia = [], 0.0
+    for chunk in make_chunks():
+        Xc = vectorizer.transform(chunk)
+        labels.append(model.predict(Xc))
+        inertia -= model.score(Xc)
+    total_seconds = time.perf_counter() - start
+    stats = {
+        "n_docs": n_docs,
+        "fit_seconds": fit_seconds,
+        "total_seconds": total_seconds,
+        "docs_per_sec": n_docs / total_seconds if total_seconds > 0 else float("inf"),
+        "inertia": inertia,
+    }
+    labels = np.concatenate(labels) if labels else np.array([], dtype=int)
+    return vectorizer, model, labels, hashed_feature_names(vectorizer, sample), stats
+
+
+def top_keywords_from_centroids(
+    cluster_ids, centroids: np.ndarray, feature_names, top_n: int = 10
 ) -> Dict[int, List[Tuple[str, float]]]:
-    features = vectorizer.get_feature_names_out()
-    df_tfidf = pd.DataFrame(X.todense(), columns=features)
+    """Top terms per centroid row; features with an empty name are never reported."""
+    import numpy as np
+
+    feature_names = np.asarray(feature_names, dtype=object)
+    unnamed = feature_names == ""
     result = {}
-    for label in sorted(np.unique(labels)):
-        if label == -1:
-            # noise for DBSCAN
-            continue
-        mask = labels == label
-        if mask.sum() == 0:
-            result[label] = []
-            continue
-        mean_tfidf = df_tfidf[mask].mean(axis=0)
-        top_idx = mean_tfidf.nlargest(top_n).index
-        top_scores = mean_tfidf.loc[top_idx].values
-        result[int(label)] = list(zip(top_idx.tolist(), top_scores.tolist()))
+    for cid, centroid in zip(cluster_ids, centroids):
+        if unnamed.any():
+            centroid = np.where(unnamed, -np.inf, centroid)
+        terms = _top_terms(centroid, feature_names, top_n)
+        result[int(cid)] = [(t, s) for t, s in terms if np.isfinite(s)]
     return result
 
 
-def assign_cluster_names(top_keywords: Dict[int, List[Tuple[str, float]]], name_top_n: int = 3, joiner: str = ", ") -> Dict[int, str]:
+def _cluster_centroids(X, labels: np.ndarray, sample_weight=None) -> Tuple[np.ndarray, np.ndarray]:
+    """(Weighted) mean row of X for every non-noise cluster, computed without densifying X.
+
+    Returns (cluster_ids, centroids) where centroids has shape (n_clusters, n_features).
+    """
+    import numpy as np
+    import scipy.sparse as sp
+
+    labels = np.asarray(labels)
+    cluster_ids = np.unique(labels)
+    cluster_ids = cluster_ids[cluster_ids != -1]
+    keep = np.flatnonzero(labels != -1)
+    rows = np.searchsorted(cluster_ids, labels[keep])
+    # Sparse (n_clusters x n_docs) indicator; its product with X sums each cluster's rows
+    weights = np.ones(len(keep), dtype=X.dtype) if sample_weight is None else np.asarray(sample_weight, dtype=X.dtype)[keep]
+    indicator = sp.csr_matrix((weights, (rows, keep)), shape=(len(cluster_ids), X.shape[0]))
+    sums = indicator @ X
+    sums = sums.toarray() if sp.issparse(sums) else np.asarray(sums)
+    counts = np.bincount(rows, weights=weights, minlength=len(cluster_ids)).astype(sums.dtype)
+    return cluster_ids, sums / np.maximum(counts, 1)[:, None]
+
+
+def _top_terms(row: np.ndarray, features, top_n: int) -> List[Tuple[str, float]]:
+    import numpy as np
+
+    # Partial selection of the top_n scores, then sort only those
+    top_n = min(top_n, len(row))
+    if top_n <= 0:
+        return []
+    idx = np.argpartition(-row, top_n - 1)[:top_n]
+    idx = idx[np.argsort(-row[idx], kind="stable")]
+    return [(str(features[i]), float(row[i])) for i in idx]
+
+
+def get_top_keywords_per_cluster(
+    vectorizer: TfidfVectorizer, X, labels: np.ndarray, top_n: int = 10, sample_weight=None
+) -> Dict[int, List[Tuple[str, float]]]:
+    # Centroids are (n_clusters x n_features), so memory no longer grows with the number of rows
+    features = vectorizer.get_feature_names_out()
+    cluster_ids, centroids = _cluster_centroids(X, labels, sample_weight=sample_weight)
+    return top_keywords_from_centroids(cluster_ids, centroids, features, top_n=top_n)
+
+
+def assign_cluster_names(
+    top_keywords: Dict[int, List[Tuple[str, float]]], name_top_n: int = 3, joiner: str = ", ", labels=None
+) -> Dict[int, str]:
     """Create a simple, descriptive name for each cluster from its top keywords.
 
     - top_keywords: mapping cluster_id -> list of (term, score)
     - name_top_n: how many top terms to include in the name
     - joiner: string used to join terms in the cluster name
+    - labels: optional row labels; if any row is -1 (density noise) it is named "noise"
     Returns mapping cluster_id -> cluster_name
     """
+    import numpy as np
+
     names = {}
     for cid, terms in top_keywords.items():
         if not terms:
@@ -115,40 +1265,557 @@ def assign_cluster_names(top_keywords: Dict[int, List[Tuple[str, float]]], name_
         # sanitize and join
         safe_terms = [str(t).replace(" ", "_") for t in top_terms]
         names[cid] = joiner.join(safe_terms)
-    # handle noise cluster -1
-    if -1 in names:
+    # handle noise cluster -1 (top keywords are never computed for it)
+    if -1 in names or (labels is not None and (np.asarray(labels) == -1).any()):
         names[-1] = "noise"
     return names
 
 
-def visualize_embeddings(X, labels: np.ndarray, method: str = "pca", perplexity: int = 30, random_state: int = 42, out_path: Optional[str] = None):
+def _stratified_sample(labels: np.ndarray, max_points: int, random_state: int = 42) -> np.ndarray:
+    """Sorted row indices: at most ~max_points rows, proportional per label, every label kept."""
+    import numpy as np
+
+    labels = np.asarray(labels)
+    n = len(labels)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    rng = np.random.RandomState(random_state)
+    ids, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    # Proportional quota with a small floor so tiny clusters (and noise) stay visible
+    floor = max(1, min(50, max_points // (2 * len(ids))))
+    quota = np.minimum(counts, np.maximum(floor, (max_points * counts) // n))
+    members = np.split(np.argsort(inverse, kind="stable"), np.cumsum(counts)[:-1])
+    picked = [rng.choice(m, q, replace=False) for m, q in zip(members, quota)]
+    return np.sort(np.concatenate(picked))
+
+
+def visualize_embeddings(
+    X,
+    labels: np.ndarray,
+    method: str = "pca",
+    perplexity: int = 30,
+    random_state: int = 42,
+    out_path: Optional[str] = None,
+    max_points: int = 20000,
+    tsne_components: int = 50,
+):
+    """2D cluster plot that stays fast on any input size.
+
+    - pca: TruncatedSVD (sparse-friendly) fitted on a stratified sample; every row is projected
+      and drawn as a grey hexbin density layer behind the coloured sample.
+    - tsne: runs on the stratified sample only, after an SVD pre-reduction to tsne_components
+      dimensions (0 disables it).
+    Points are rasterized so large plots stay light to render and save.
+    """
+    import pandas as pd
+    import numpy as np
+    import scipy.sparse as sp
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.manifold import TSNE
+
+    labels = np.asarray(labels)
+    idx = _stratified_sample(labels, max_points, random_state)
+    emb_all = None
     if method == "pca":
-        reducer = PCA(n_components=2, random_state=random_state)
-        emb = reducer.fit_transform(X.toarray() if hasattr(X, "toarray") else X)
+        if X.shape[1] > 2:
+            reducer = TruncatedSVD(n_components=2, random_state=random_state).fit(X[idx])
+            emb_all = reducer.transform(X)
+        else:
+            emb_all = X.toarray() if sp.issparse(X) else np.asarray(X)
+        emb = emb_all[idx]
     elif method == "tsne":
-        reducer = TSNE(n_components=2, perplexity=perplexity, random_state=random_state)
-        emb = reducer.fit_transform(X.toarray() if hasattr(X, "toarray") else X)
+        Xs = X[idx]
+        if tsne_components and Xs.shape[1] > tsne_components:
+            Xs = TruncatedSVD(n_components=tsne_components, random_state=random_state).fit_transform(Xs)
+        elif sp.issparse(Xs):
+            Xs = Xs.toarray()
+        reducer = TSNE(n_components=2, perplexity=min(perplexity, max(1, len(idx) - 1)), random_state=random_state)
+        emb = reducer.fit_transform(Xs)
     else:
         raise ValueError("Unknown visualization method: choose 'pca' or 'tsne'")
 
-    df_vis = pd.DataFrame({"x": emb[:, 0], "y": emb[:, 1], "label": labels})
-    plt.figure(figsize=(8, 6))
+    df_vis = pd.DataFrame({"x": emb[:, 0], "y": emb[:, 1], "label": labels[idx]})
+    fig, ax = plt.subplots(figsize=(8, 6))
+    if emb_all is not None and len(idx) < len(labels):
+        ax.hexbin(emb_all[:, 0], emb_all[:, 1], gridsize=80, bins="log", mincnt=1, cmap="Greys", alpha=0.6)
     palette = sns.color_palette("hsv", len(np.unique(labels)))
-    sns.scatterplot(data=df_vis, x="x", y="y", hue="label", palette=palette, legend="full", s=40)
-    plt.title(f"Cluster visualization ({method})")
-    plt.tight_layout()
+    size = 40 if len(idx) <= 2000 else 8
+    sns.scatterplot(
+        data=df_vis, x="x", y="y", hue="label", palette=palette, legend="full", s=size, linewidth=0, rasterized=True, ax=ax
+    )
+    shown = f"{len(idx)} of {len(labels)} rows" if len(idx) < len(labels) else f"{len(labels)} rows"
+    ax.set_title(f"Cluster visualization ({method}, {shown})")
+    fig.tight_layout()
     if out_path:
-        plt.savefig(out_path)
+        fig.savefig(out_path)
         print(f"Saved visualization to: {out_path}")
     else:
         plt.show()
-    plt.close()
+    plt.close(fig)
+
+
+def build_model_bundle(
+    model,
+    vectorizer,
+    cluster_names: Dict[int, str],
+    top_keywords,
+    X=None,
+    labels=None,
+    normalizers=DEFAULT_NORMALIZERS,
+    sample_weight=None,
+    reducer=None,
+) -> dict:
+    """Collect everything needed to label new texts later into one dict.
+
+    When X and labels are given, normalized per-cluster centroids are stored too so that
+    algorithms without predict() (DBSCAN, agglomerative, ...) can still assign new rows.
+    The preprocessing normalizers are recorded so new texts are prepared the same way.
+    With an LSA reducer, X is the reduced matrix the model was fitted on and the reducer
+    is stored so bundle_transform() can project new texts into the same space.
+    """
+    from sklearn.preprocessing import normalize
+
+    bundle = {
+        "model": model,
+        "vectorizer": vectorizer,
+        "cluster_names": cluster_names,
+        "top_keywords": top_keywords,
+        "normalizers": list(parse_normalizers(normalizers)),
+    }
+    if reducer is not None:
+        bundle["reducer"] = reducer
+    if X is not None and labels is not None:
+        centroid_labels, centroids = _cluster_centroids(X, labels, sample_weight=sample_weight)
+        bundle["centroids"] = normalize(centroids)
+        bundle["centroid_labels"] = centroid_labels
+    return bundle
+
+
+MODEL_FORMATS = ("joblib", "compact")
+COMPACT_FORMAT_VERSION = 1
+
+
+def model_format_for_path(path: str) -> str:
+    """'compact' for a directory or a path ending in .model (or with no extension), else 'joblib'."""
+    if os.path.isdir(path) or os.path.basename(path) == "meta.json":
+        return "compact"
+    return "compact" if os.path.splitext(path)[1].lower() in ("", ".model") else "joblib"
+
+
+def save_model_bundle(bundle: dict, path: str, model_format: Optional[str] = None):
+    """Write a bundle as one joblib pickle or as a compact directory (see save_compact_bundle)."""
+    if (model_format or model_format_for_path(path)) == "compact":
+        return save_compact_bundle(bundle, path)
+    import joblib
+
+    joblib.dump(bundle, path)
+
+
+def load_model_bundle(path: str) -> dict:
+    if model_format_for_path(path) == "compact" and os.path.exists(path):
+        return load_compact_bundle(path)
+    import joblib
+
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict) or "model" not in bundle or "vectorizer" not in bundle:
+        raise ValueError(f"{path} is not a model bundle saved by this tool")
+    return bundle
+
+
+class CentroidModel:
+    """Nearest-centroid stand-in for a fitted clustering model, rebuilt from a compact bundle.
+
+    metric="euclidean" reproduces KMeans.predict from cluster_centers_; metric="cosine"
+    matches assign_to_centroids for algorithms without predict().
+    """
+
+    def __init__(self, cluster_centers: np.ndarray, labels: np.ndarray, metric: str = "euclidean", source: str = ""):
+        import numpy as np
+
+        self.cluster_centers_ = cluster_centers
+        self.labels = np.asarray(labels)
+        self.metric = metric
+        self.source = source
+        self._sq_norms = (np.asarray(cluster_centers, dtype=np.float64) ** 2).sum(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        import numpy as np
+
+        scores = np.asarray(X @ self.cluster_centers_.T)
+        if self.metric == "euclidean":
+            # argmin ||x - c||^2 == argmax 2 x.c - ||c||^2
+            scores = 2 * scores - self._sq_norms
+        return self.labels[scores.argmax(axis=1)]
+
+    def __repr__(self):
+        return f"CentroidModel({self.source or self.metric}, n_clusters={len(self.labels)})"
+
+
+def _json_default(value):
+    import numpy as np
+
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _vectorizer_params(vectorizer) -> dict:
+    import numpy as np
+
+    params = {}
+    for key, value in vectorizer.get_params().items():
+        if key == "vocabulary":
+            continue
+        if key == "dtype":
+            value = np.dtype(value).name
+        elif callable(value):
+            raise ValueError(f"Vectorizer parameter '{key}' is a callable; save this model in joblib format")
+        params[key] = value
+    return params
+
+
+def save_compact_bundle(bundle: dict, path: str):
+    """Write a bundle as a directory of JSON metadata plus .npy arrays.
+
+    The vocabulary is stored as an array of terms in column order; IDF weights and centroids
+    are float32; the vectorizer's stop_words_ set and the pickled model are not stored. Loading
+    memory-maps the arrays and rebuilds a predict-capable model (CentroidModel), so it takes
+    milliseconds. The directory is written next to path and swapped in when complete.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    model, vectorizer = bundle["model"], bundle["vectorizer"]
+    arrays = {}
+    meta = {
+        "format": "text_analyzer_pro.compact",
+        "format_version": COMPACT_FORMAT_VERSION,
+        "vectorizer_type": "hashing" if isinstance(vectorizer, HashingVectorizer) else "tfidf",
+        "vectorizer_params": _vectorizer_params(vectorizer),
+        "model_type": getattr(model, "source", None) or type(model).__name__,
+        "cluster_names": {str(k): v for k, v in bundle.get("cluster_names", {}).items()},
+        "top_keywords": {str(k): [[t, float(w)] for t, w in v] for k, v in bundle.get("top_keywords", {}).items()},
+    }
+    if meta["vectorizer_type"] == "tfidf":
+        arrays["vocabulary"] = np.asarray(vectorizer.get_feature_names_out(), dtype=str)
+        arrays["idf"] = np.asarray(vectorizer.idf_, dtype=np.float32)
+    if "reducer" in bundle:
+        arrays["lsa_components"] = np.asarray(bundle["reducer"][0].components_, dtype=np.float32)
+    if hasattr(model, "predict") and hasattr(model, "cluster_centers_"):
+        arrays["centers"] = np.asarray(model.cluster_centers_, dtype=np.float32)
+        arrays["center_labels"] = getattr(model, "labels", None)
+        if arrays["center_labels"] is None:
+            arrays["center_labels"] = np.arange(len(arrays["centers"]))
+        meta["center_metric"] = getattr(model, "metric", "euclidean")
+    if "centroids" in bundle:
+        arrays["centroids"] = np.asarray(bundle["centroids"], dtype=np.float32)
+        arrays["centroid_labels"] = np.asarray(bundle["centroid_labels"])
+    for key in ("row_fingerprints", "row_labels"):
+        if key in bundle:
+            arrays[key] = np.asarray(bundle[key])
+    for key, value in bundle.items():
+        if key not in meta and key not in arrays and key not in ("model", "vectorizer", "reducer", "centroids", "centroid_labels"):
+            meta[key] = value
+
+    path = path[: -len("meta.json")].rstrip("/\\") if os.path.basename(path) == "meta.json" else path
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), array, allow_pickle=False)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1, default=_json_default)
+        old = None
+        if os.path.exists(path):
+            old = f"{path}.old-{os.getpid()}"
+            os.replace(path, old)
+        os.replace(tmp, path)
+        if old:
+            # arrays of a previously loaded bundle may still be memory-mapped (Windows keeps them locked)
+            shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_compact_bundle(path: str) -> dict:
+    """Load a bundle written by save_compact_bundle; arrays are memory-mapped read-only."""
+    import numpy as np
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+
+    path = os.path.dirname(path) if os.path.basename(path) == "meta.json" else path
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.isfile(meta_path):
+        raise ValueError(f"{path} is not a compact model bundle (no meta.json)")
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != "text_analyzer_pro.compact" or meta.get("format_version", 0) > COMPACT_FORMAT_VERSION:
+        raise ValueError(f"{path} was written by an unsupported version of this tool")
+
+    def array(name):
+        file = os.path.join(path, f"{name}.npy")
+        return np.load(file, mmap_mode="r", allow_pickle=False) if os.path.exists(file) else None
+
+    params = dict(meta.pop("vectorizer_params"))
+    params["dtype"] = np.dtype(params["dtype"]).type
+    params["ngram_range"] = tuple(params["ngram_range"])
+    if meta.pop("vectorizer_type") == "hashing":
+        vectorizer = HashingVectorizer(**params)
+    else:
+        vocabulary = array("vocabulary")
+        vectorizer = TfidfVectorizer(**params, vocabulary={t: i for i, t in enumerate(vocabulary.tolist())})
+        vectorizer.idf_ = array("idf")
+
+    bundle = {k: v for k, v in meta.items() if k not in ("format", "format_version", "center_metric", "model_type")}
+    bundle["vectorizer"] = vectorizer
+    bundle["cluster_names"] = {int(k): v for k, v in meta["cluster_names"].items()}
+    bundle["top_keywords"] = {int(k): [(t, w) for t, w in v] for k, v in meta["top_keywords"].items()}
+    for key in ("centroids", "centroid_labels", "row_fingerprints", "row_labels"):
+        value = array(key)
+        if value is not None:
+            bundle[key] = value
+    if array("lsa_components") is not None:
+        bundle["reducer"] = lsa_from_components(array("lsa_components"))
+    if array("centers") is not None:
+        model = CentroidModel(array("centers"), array("center_labels"), meta.get("center_metric", "euclidean"), meta["model_type"])
+    elif "centroids" in bundle:
+        model = CentroidModel(bundle["centroids"], bundle["centroid_labels"], "cosine", meta["model_type"])
+    else:
+        raise ValueError(f"{path} has neither cluster centres nor centroids to predict with")
+    bundle["model"] = model
+    return bundle
+
+
+def assign_to_centroids(X, centroids: np.ndarray, centroid_labels: np.ndarray) -> np.ndarray:
+    """Label each row with its most cosine-similar centroid (rows of X are L2-normalized TF-IDF)."""
+    import numpy as np
+
+    sims = X @ centroids.T
+    return np.asarray(centroid_labels)[np.asarray(sims).argmax(axis=1)]
+
+
+def centroid_similarity(X, centroids: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each row of X to its nearest centroid."""
+    import numpy as np
+
+    return np.asarray((X @ centroids.T).max(axis=1)).ravel()
+
+
+def row_fingerprints(texts: pd.Series) -> np.ndarray:
+    """64-bit content hash per row; equal texts get equal fingerprints wherever they appear."""
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(texts.reset_index(drop=True), index=False).to_numpy()
+
+
+def incremental_state(texts: pd.Series, labels: np.ndarray, X, bundle: dict, params: dict, sample_weight=None) -> dict:
+    """Bundle entries that let `incremental` tell new rows from already labelled ones.
+
+    Stores the row fingerprints and labels of the fitted input, the run parameters needed
+    to refit, and the mean nearest-centroid similarity of the fit as the drift baseline.
+    texts and labels cover every input row; X may hold deduplicated rows weighted by sample_weight.
+    """
+    import numpy as np
+
+    state = {
+        "row_fingerprints": row_fingerprints(texts),
+        "row_labels": np.asarray(labels),
+        "fit_rows": len(labels),
+        "rows_since_fit": 0,
+        "params": {k: v for k, v in params.items() if k not in ("input", "output", "model_path", "save_model")},
+    }
+    if "centroids" in bundle:
+        state["fit_similarity"] = float(np.average(centroid_similarity(X, bundle["centroids"]), weights=sample_weight))
+    return state
+
+
+def bundle_transform(bundle: dict, texts: List[str]):
+    """Vectorize preprocessed texts into the space the bundle's model was fitted in (TF-IDF, then LSA if used)."""
+    X = bundle["vectorizer"].transform(texts)
+    reducer = bundle.get("reducer")
+    return X if reducer is None else reducer.transform(X).astype(X.dtype, copy=False)
+
+
+def predict_labels(bundle: dict, texts: List[str]) -> np.ndarray:
+    """Assign preprocessed texts to the clusters of a saved bundle without refitting."""
+    import numpy as np
+
+    X = bundle_transform(bundle, texts)
+    model = bundle["model"]
+    if hasattr(model, "predict"):
+        return np.asarray(model.predict(X))
+    if "centroids" not in bundle:
+        raise ValueError(
+            f"{type(model).__name__} has no predict() and this bundle has no stored centroids; "
+            "re-save the model with this version to enable prediction"
+        )
+    return assign_to_centroids(X, bundle["centroids"], bundle["centroid_labels"])
+
+
+def fit_sample_indices(n_rows: int, sample_size: int, strata=None, random_state: int = 42) -> np.ndarray:
+    """Sorted indices of the rows to fit on: uniform at random, or proportional per stratum.
+
+    With strata (one value per row) every stratum keeps at least a few rows, as in the
+    visualization sample.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if n_rows <= sample_size:
+        return np.arange(n_rows)
+    if strata is not None:
+        return _stratified_sample(pd.factorize(pd.Series(strata), use_na_sentinel=False)[0], sample_size, random_state)
+    rng = np.random.RandomState(random_state)
+    return np.sort(rng.choice(n_rows, sample_size, replace=False))
+
+
+# Rows per task when assign_in_chunks spreads labelling over worker processes
+ASSIGN_CHUNKSIZE = 20000
+
+
+def assign_in_chunks(bundle: dict, texts: List[str], n_jobs: int = -1, chunksize: int = ASSIGN_CHUNKSIZE) -> np.ndarray:
+    """predict_labels over chunks of preprocessed texts, run in a process pool when there is more than one chunk."""
+    import numpy as np
+    import joblib
+
+    chunks = [texts[i : i + chunksize] for i in range(0, len(texts), chunksize)]
+    if not chunks:
+        return np.array([], dtype=int)
+    if len(chunks) == 1 or n_jobs == 1:
+        parts = [predict_labels(bundle, chunk) for chunk in chunks]
+    else:
+        parts = joblib.Parallel(n_jobs=n_jobs)(joblib.delayed(predict_labels)(bundle, chunk) for chunk in chunks)
+    return np.concatenate(parts)
+
+
+OUTPUT_FORMATS = {".xlsx": "xlsx", ".xlsm": "xlsx", ".csv": "csv", ".tsv": "csv", ".txt": "csv", ".parquet": "parquet", ".pq": "parquet"}
+# Excel's hard limit, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+
+def iter_table_chunks(
+    path: str, sheet_name: Optional[str] = None, chunksize: int = DEFAULT_CHUNKSIZE, dtype=None
+) -> Iterator[pd.DataFrame]:
+    """Yield the whole input table (all columns) in chunks, with row positions as the index.
+
+    Rows line up with iter_text_column on the same input. dtype is passed to read_csv (CSV input only).
+    """
+    import pandas as pd
+
+    fmt = detect_input_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, sep=_csv_sep(path), chunksize=chunksize, dtype=dtype)
+    elif fmt == "parquet":
+        start = 0
+        for batch in _parquet_file(path).iter_batches(batch_size=chunksize):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(start, start + len(df))
+            start += len(df)
+            yield df
+    elif fmt == "xls":
+        yield load_table(path, sheet_name=sheet_name)
+    else:
+        rows = _xlsx_rows(path, sheet_name)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header_names(header)
+        width = len(columns)
+        start, buf = 0, []
+        for row in rows:
+            buf.append((list(row) + [None] * width)[:width])
+            if len(buf) >= chunksize:
+                yield pd.DataFrame(buf, columns=columns, index=pd.RangeIndex(start, start + len(buf)))
+                start += len(buf)
+                buf = []
+        if buf or start == 0:
+            yield pd.DataFrame(buf, columns=columns, index=pd.RangeIndex(start, start + len(buf)))
+
+
+def write_table_chunks(chunks: Iterable[pd.DataFrame], out_path: str) -> int:
+    """Write DataFrame chunks to .xlsx, .csv or .parquet (by extension) in constant memory.
+
+    .xlsx uses openpyxl's write-only mode, so rows are streamed instead of building every cell object.
+    Returns the number of rows written.
+    """
+    fmt = OUTPUT_FORMATS.get(os.path.splitext(out_path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported output format for {out_path}. Use .xlsx, .csv or .parquet")
+    # Write next to the target and rename at the end, so a failure never leaves a truncated file behind
+    root, ext = os.path.splitext(out_path)
+    tmp_path = f"{root}.tmp{ext}"
+    try:
+        n_rows = _write_table_chunks(chunks, tmp_path, fmt)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return n_rows
 
 
-def save_results_excel(df: pd.DataFrame, out_path: str):
+def _write_table_chunks(chunks: Iterable[pd.DataFrame], out_path: str, fmt: str) -> int:
+    n_rows = 0
+    if fmt == "csv":
+        sep = _csv_sep(out_path)
+        for chunk in chunks:
+            chunk.to_csv(out_path, sep=sep, index=False, mode="w" if n_rows == 0 else "a", header=n_rows == 0)
+            n_rows += len(chunk)
+    elif fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Writing Parquet files requires pyarrow (pip install pyarrow)") from e
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+                if writer is None:
+                    # a column that is empty in the first chunk must still accept text later on
+                    schema = pa.schema(
+                        [f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema],
+                        metadata=table.schema.metadata,
+                    )
+                    table = table.cast(schema)
+                    writer = pq.ParquetWriter(out_path, schema)
+                writer.write_table(table)
+                n_rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+        header_written = False
+        for chunk in chunks:
+            if not header_written:
+                worksheet.append([str(c) for c in chunk.columns])
+                header_written = True
+            if n_rows + len(chunk) >= EXCEL_MAX_ROWS:
+                raise ValueError(f"More than {EXCEL_MAX_ROWS - 1} rows do not fit in .xlsx; write .csv or .parquet instead")
+            # write-only openpyxl cannot store NaN/NaT; leave those cells empty
+            cells = chunk.astype(object).where(chunk.notna(), None)
+            for row in cells.itertuples(index=False, name=None):
+                worksheet.append(list(row))
+            n_rows += len(chunk)
+        workbook.save(out_path)
+    return n_rows
+
+
+def _write_with_fallback(write: Callable[[str], object], out_path: str) -> str:
+    """Run write(path); if the target is locked or read-only, write next to it under a timestamped name."""
     try:
-        df.to_excel(out_path, index=False, engine="openpyxl")
+        write(out_path)
         print(f"Saved results to {out_path}")
+        return out_path
     except PermissionError:
         # Fall back to a new filename if the target file is open or not writable
         from datetime import datetime
@@ -156,99 +1823,1026 @@ def save_results_excel(df: pd.DataFrame, out_path: str):
         base, ext = os.path.splitext(out_path)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         alt_path = f"{base}_writable_{timestamp}{ext}"
-        df.to_excel(alt_path, index=False, engine="openpyxl")
+        write(alt_path)
         print(f"Could not overwrite {out_path} (permission denied). Saved to {alt_path} instead.")
+        return alt_path
+
+
+def save_results_excel(df: pd.DataFrame, out_path: str) -> str:
+    """Write df to out_path; the format (.xlsx, .csv, .parquet) follows the extension."""
+    return _write_with_fallback(lambda p: write_table_chunks([df], p), out_path)
+
+
+def _label_slice(values, start: int, length: int) -> np.ndarray:
+    import numpy as np
+
+    if np.ndim(values) == 0:
+        return np.full(length, values, dtype=object)
+    part = np.asarray(values, dtype=object)[start : start + length]
+    if len(part) != length:
+        raise ValueError("Input has more rows than labels; was the file modified during the run?")
+    return part
+
+
+def write_labelled_output(
+    input_path: str,
+    sheet_name: Optional[str],
+    out_path: str,
+    labels,
+    names=None,
+    columns: str = "all",
+    key_column=None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> str:
+    """Write cluster_label/cluster_name for every input row.
+
+    columns="all" streams the input table chunk by chunk and appends the two columns;
+    columns="labels" writes only key_column (or the row position) plus the two columns, so
+    the rest of the input is never read. labels (and names) must have one entry per input row
+    (names may also be a single value).
+    """
+    import pandas as pd
+
+    import numpy as np
+
+    # Parquet needs one schema for the whole file, but CSV and Excel chunks get their dtypes
+    # separately (a column can be empty or numeric early and text later), so pass them through as text
+    out_format = OUTPUT_FORMATS.get(os.path.splitext(out_path)[1].lower())
+    as_text = out_format == "parquet" and detect_input_format(input_path) != "parquet"
+    dtype = str if as_text else None
+
+    def with_labels(chunk: pd.DataFrame, start: int) -> pd.DataFrame:
+        if as_text:
+            chunk = chunk.astype(object).where(chunk.isna(), chunk.astype(str))
+        chunk["cluster_label"] = _label_slice(labels, start, len(chunk))
+        if names is not None:
+            chunk["cluster_name"] = _label_slice(names, start, len(chunk))
+        return chunk
+
+    def chunks():
+        start = 0
+        if columns == "labels":
+            if key_column is None:
+                # Without a key column the row position identifies each row
+                n = len(labels)
+                for s in range(0, n, chunksize):
+                    yield with_labels(pd.DataFrame({"row": np.arange(s, min(s + chunksize, n))}), s)
+                return
+            for key in iter_text_column(input_path, key_column, sheet_name=sheet_name, chunksize=chunksize, dtype=dtype):
+                yield with_labels(key.to_frame(), start)
+                start += len(key)
+            return
+        for chunk in iter_table_chunks(input_path, sheet_name=sheet_name, chunksize=chunksize, dtype=dtype):
+            yield with_labels(chunk, start)
+            start += len(chunk)
+
+    return _write_with_fallback(lambda p: write_table_chunks(chunks(), p), out_path)
+
+
+def _rss_reader() -> Optional[Callable[[], int]]:
+    """Return a function giving the current RSS in bytes (psutil, else /proc/self/statm), or None."""
+    try:
+        import psutil
+
+        proc = psutil.Process()
+        return lambda: proc.memory_info().rss
+    except ImportError:
+        pass
+    if os.path.exists("/proc/self/statm"):
+        page = os.sysconf("SC_PAGE_SIZE")
+
+        def read():
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * page
+
+        return read
+    return None
+
+
+PROFILE_STAGES = (
+    "read", "cache", "preprocess", "dedupe", "vectorize", "lsa", "auto_k", "cluster", "assign", "keywords", "write", "visualize", "save_model", "streaming"
+)
+
+
+class StageProfiler:
+    """Record wall time, CPU time and peak RSS per pipeline stage.
+
+    Peak RSS is sampled on a background thread every `interval` seconds while a stage runs.
+    Stages named in `cprofile_stages` also run under cProfile; the stats are dumped to
+    `<cprofile_prefix>_<stage>[_<algorithm>].prof` and the top functions by cumulative time are kept in the record.
+    """
+
+    def __init__(self, cprofile_stages: Iterable[str] = (), cprofile_prefix: Optional[str] = None, interval: float = 0.01):
+        self.cprofile_stages = set(cprofile_stages)
+        self.cprofile_prefix = cprofile_prefix
+        self.interval = interval
+        self.records: List[dict] = []
+        self._read_rss = _rss_reader()
+
+    @contextmanager
+    def stage(self, name: str, **tags):
+        peak = [None]
+        stop = threading.Event()
+        baseline = self._read_rss() if self._read_rss else None
+
+        def sample():
+            while not stop.is_set():
+                rss = self._read_rss()
+                peak[0] = rss if peak[0] is None else max(peak[0], rss)
+                stop.wait(self.interval)
+
+        sampler = threading.Thread(target=sample, daemon=True) if self._read_rss else None
+        if sampler:
+            sampler.start()
+        profile = None
+        if name in self.cprofile_stages:
+            import cProfile
+
+            profile = cProfile.Profile()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stop.set()
+            record = {"stage": name, **tags, "wall_s": wall, "cpu_s": cpu}
+            if sampler:
+                sampler.join()
+                final = self._read_rss()
+                peak[0] = final if peak[0] is None else max(peak[0], final)
+                record["peak_rss_mb"] = peak[0] / 2 ** 20
+                record["rss_delta_mb"] = (peak[0] - baseline) / 2 ** 20
+            if profile:
+                label = name + (f"_{tags['algorithm']}" if tags.get("algorithm") else "")
+                record.update(self._dump_profile(label, profile))
+            self.records.append(record)
+
+    def _dump_profile(self, name: str, profile) -> dict:
+        import pstats
 
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(20)
+        info = {"cprofile_top": out.getvalue()}
+        if self.cprofile_prefix:
+            path = f"{self.cprofile_prefix}_{name}.prof"
+            try:
+                profile.dump_stats(path)
+                info["cprofile_path"] = path
+            except OSError as e:
+                print(f"Could not write profile for stage {name}: {e}")
+        return info
 
-def main():
-    parser = argparse.ArgumentParser(description="Cluster text data from an Excel file and write cluster labels back to Excel.")
-    parser.add_argument("--input", "-i", required=True, help="Input Excel file path")
-    parser.add_argument("--sheet", "-s", default=None, help="Sheet name or index (optional)")
+    def summary(self) -> str:
+        """Fixed-width table of the recorded stages, with a total row."""
+        lines = [f"{'stage':<14} {'wall_s':>9} {'cpu_s':>9} {'peak_mb':>9} {'delta_mb':>9}"]
+        for r in self.records:
+            peak = f"{r['peak_rss_mb']:.1f}" if "peak_rss_mb" in r else "-"
+            delta = f"{r['rss_delta_mb']:+.1f}" if "rss_delta_mb" in r else "-"
+            lines.append(f"{r['stage']:<14} {r['wall_s']:>9.3f} {r['cpu_s']:>9.3f} {peak:>9} {delta:>9}")
+        lines.append(
+            f"{'total':<14} {sum(r['wall_s'] for r in self.records):>9.3f} {sum(r['cpu_s'] for r in self.records):>9.3f}"
+        )
+        return "\n".join(lines)
+
+    def to_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.records}, f, indent=2)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Cluster text data from an Excel, CSV or Parquet file and write cluster labels back out.",
+        epilog="To label new files with a saved model, run: cluster_tool.py predict --help. "
+        "To run many jobs from a manifest, run: cluster_tool.py batch --help. "
+        "To label only rows added since a saved model, run: cluster_tool.py incremental --help. "
+        "To serve saved models over local HTTP, run: cluster_tool.py serve --help",
+    )
+    parser.add_argument("--input", "-i", required=True, help="Input file path (.xlsx, .xls, .csv or .parquet)")
+    parser.add_argument("--sheet", "-s", default=None, help="Sheet name or index (optional, Excel only)")
     parser.add_argument("--column", "-c", required=True, help="Text column name to cluster")
-    parser.add_argument("--algorithm", "-a", choices=["kmeans", "dbscan", "agglomerative"], default="kmeans")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk when streaming the text column")
+    parser.add_argument("--algorithm", "-a", choices=ALGORITHMS, default="kmeans")
     parser.add_argument("--n_clusters", "-k", type=int, default=5, help="Number of clusters (for kmeans/agglomerative)")
-    parser.add_argument("--eps", type=float, default=0.5, help="DBSCAN eps parameter")
-    parser.add_argument("--min_samples", type=int, default=5, help="DBSCAN min_samples")
+    parser.add_argument("--auto_k", default=None, metavar="MIN:MAX", help="Pick n_clusters by sweeping this range")
+    parser.add_argument("--auto_k_metric", choices=SWEEP_METRICS, default="silhouette", help="Score used to pick k")
+    parser.add_argument("--auto_k_jobs", type=int, default=-1, help="Worker processes for the k sweep (-1 = all cores)")
+    parser.add_argument("--auto_k_sample", type=int, default=2000, help="Rows sampled for silhouette/Calinski-Harabasz")
+    parser.add_argument(
+        "--eps",
+        type=float,
+        default=None,
+        help=f"DBSCAN eps (cosine distance; default {DBSCAN_EPS} for dbscan, {DBSCAN_FAST_EPS} for dbscan_fast after SVD)",
+    )
+    parser.add_argument("--min_samples", type=int, default=5, help="DBSCAN/HDBSCAN min_samples")
+    parser.add_argument(
+        "--min_cluster_size",
+        type=int,
+        default=None,
+        help=f"HDBSCAN smallest cluster (default: {HDBSCAN_MIN_CLUSTER_SIZE} or rows/1000, whichever is larger)",
+    )
+    parser.add_argument(
+        "--exact_neighbors",
+        action="store_true",
+        help="dbscan_fast: keep every pair within eps instead of --n_neighbors per row (exact, memory grows quadratically)",
+    )
+    parser.add_argument("--svd_components", type=int, default=100, help="SVD dimensions used by agglomerative_knn, dbscan_fast and hdbscan")
+    parser.add_argument(
+        "--lsa",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Reduce TF-IDF to N LSA components (truncated SVD + L2 norm) before clustering; 0 = off",
+    )
+    parser.add_argument(
+        "--fit_sample",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Vectorize and cluster a sample of N rows, then assign every other row to the fitted clusters (0 = fit on all rows)",
+    )
+    parser.add_argument("--sample_strata", default=None, metavar="COLUMN", help="Stratify --fit_sample by this column's values")
+    parser.add_argument("--assign_jobs", type=int, default=-1, help="Worker processes that assign rows outside --fit_sample (default: all cores)")
+    parser.add_argument("--n_neighbors", type=int, default=10, help="Neighbours per row in the knn graph (agglomerative_knn, dbscan_fast)")
+    parser.add_argument("--batch_size", type=int, default=1024, help="Mini-batch size for minibatch_kmeans")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Out-of-core minibatch_kmeans: hash and partial_fit the text column chunk by chunk",
+    )
+    parser.add_argument("--hash_features", type=int, default=2 ** 18, help="Hashed feature count used with --streaming")
     parser.add_argument("--max_features", type=int, default=2000, help="Max features for TF-IDF")
-    parser.add_argument("--output", "-o", default=None, help="Output Excel path (optional) — defaults to input + _clustered.xlsx")
+    parser.add_argument(
+        "--dtype",
+        choices=DTYPES,
+        default=DEFAULT_DTYPE,
+        help="Precision of the TF-IDF matrix, embeddings and centroids (default: float64; float32 halves the memory)",
+    )
+    parser.add_argument(
+        "--normalize",
+        default=",".join(DEFAULT_NORMALIZERS),
+        help=f"Comma-separated preprocessing steps, applied in order: {', '.join(NORMALIZERS)}",
+    )
+    parser.add_argument(
+        "--dedupe",
+        choices=DEDUPE_MODES,
+        default="none",
+        help="Cluster one representative per exact or near-duplicate text, weighted by its count",
+    )
+    parser.add_argument(
+        "--near_dup_threshold", type=float, default=0.8, help="Estimated Jaccard similarity that counts as a near duplicate"
+    )
+    parser.add_argument(
+        "--preprocess_jobs", type=int, default=-1, help="Worker processes for expensive normalizers like stem (-1 = all cores)"
+    )
+    parser.add_argument(
+        "--vectorize_jobs",
+        type=int,
+        default=-1,
+        help=f"Worker processes that count TF-IDF shards for inputs of {PARALLEL_VECTORIZE_MIN_ROWS}+ rows "
+        "(default: all cores; the result equals the serial fit)",
+    )
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help="Directory for cached TF-IDF matrices")
+    parser.add_argument("--cache_max_mb", type=int, default=DEFAULT_CACHE_MAX_MB, help="Cache size limit before LRU eviction")
+    parser.add_argument("--no_cache", action="store_true", help="Do not read or write the TF-IDF cache")
+    parser.add_argument(
+        "--output", "-o", default=None, help="Output path (.xlsx, .csv or .parquet) — defaults to input + _clustered.xlsx"
+    )
+    parser.add_argument(
+        "--output_columns",
+        choices=["all", "labels"],
+        default="all",
+        help="Write every input column, or only the key column plus cluster_label/cluster_name",
+    )
+    parser.add_argument("--key_column", default=None, help="Column kept with --output_columns labels (default: row position)")
     parser.add_argument("--visualize", "-v", action="store_true", help="Visualize clusters (PCA)")
     parser.add_argument("--vis_method", choices=["pca", "tsne"], default="pca", help="Visualization method")
+    parser.add_argument("--vis_max_points", type=int, default=20000, help="Stratified sample size drawn per plot")
+    parser.add_argument(
+        "--vis_tsne_components", type=int, default=50, help="SVD dimensions before t-SNE (0 = no pre-reduction)"
+    )
     parser.add_argument("--top_n", type=int, default=10, help="Top keywords per cluster")
     parser.add_argument("--name_top_n", type=int, default=3, help="Number of top keywords to form cluster name")
     parser.add_argument("--name_joiner", type=str, default=", ", help="String to join keywords when forming cluster name")
-    parser.add_argument("--save_model", action="store_true", help="Save trained clustering model (joblib)")
+    parser.add_argument("--save_model", action="store_true", help="Save trained clustering model (see --model_format)")
     parser.add_argument("--model_path", default=None, help="Path to save the model (optional)")
+    parser.add_argument(
+        "--model_format",
+        choices=MODEL_FORMATS,
+        default=None,
+        help="Model bundle format: one joblib file, or a compact directory of arrays that loads "
+        "memory-mapped in milliseconds (default: from --model_path, else joblib)",
+    )
+    parser.add_argument("--profile_json", default=None, help="Write per-stage wall/CPU/peak-RSS timings to this JSON file")
+    parser.add_argument(
+        "--profile_stage",
+        action="append",
+        choices=PROFILE_STAGES,
+        default=[],
+        help="Run this stage under cProfile (repeatable); stats go to <output>_profile_<stage>.prof",
+    )
+    return parser
+
+
+def _run_streaming(args, out_path: str):
+    """--streaming path: hash + partial_fit chunk by chunk, never holding the full matrix."""
 
-    args = parser.parse_args()
+    def make_chunks():
+        for chunk in iter_text_column(args.input, args.column, sheet_name=args.sheet, chunksize=args.chunksize):
+            yield preprocess_texts(coerce_text_column(chunk), normalizers=args.normalize, n_jobs=args.preprocess_jobs)
+
+    vectorizer, model, labels, feature_names, stats = cluster_texts_streaming(
+        make_chunks,
+        n_clusters=args.n_clusters,
+        n_features=args.hash_features,
+        batch_size=args.batch_size,
+        dtype=args.dtype,
+    )
+    print(
+        f"Clustered {stats['n_docs']} docs in {stats['total_seconds']:.1f}s "
+        f"({stats['docs_per_sec']:.0f} docs/sec), inertia: {stats['inertia']:.4f}"
+    )
+    top_keywords = top_keywords_from_centroids(range(args.n_clusters), model.cluster_centers_, feature_names, top_n=args.top_n)
+    print("Top keywords per cluster:")
+    for cluster_id, terms in top_keywords.items():
+        print(f"Cluster {cluster_id}: ", ", ".join([t for t, s in terms]))
+    cluster_names = assign_cluster_names(top_keywords, name_top_n=args.name_top_n, joiner=args.name_joiner)
+    out_path = write_labelled_output(
+        args.input,
+        args.sheet,
+        out_path,
+        labels,
+        [cluster_names.get(int(l), "") for l in labels],
+        columns=args.output_columns,
+        key_column=args.key_column,
+        chunksize=args.chunksize,
+    )
+    if args.visualize:
+        print("Visualization is not available with --streaming (the full matrix is never built).")
+    return model, vectorizer, cluster_names, top_keywords, out_path
+
+
+def build_predict_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cluster_tool.py predict",
+        description="Label a new file with a model saved by --save_model, without refitting.",
+    )
+    parser.add_argument("--model", "-m", required=True, help="Saved model bundle (.joblib)")
+    parser.add_argument("--input", "-i", required=True, help="Input file path (.xlsx, .xls, .csv or .parquet)")
+    parser.add_argument("--sheet", "-s", default=None, help="Sheet name or index (optional, Excel only)")
+    parser.add_argument("--column", "-c", required=True, help="Text column name to label")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows transformed per chunk")
+    parser.add_argument(
+        "--output", "-o", default=None, help="Output path (.xlsx, .csv or .parquet) — defaults to input + _predicted.xlsx"
+    )
+    parser.add_argument("--output_columns", choices=["all", "labels"], default="all", help="Write every input column, or only key + labels")
+    parser.add_argument("--key_column", default=None, help="Column kept with --output_columns labels (default: row position)")
+    return parser
+
+
+def predict_main(argv: Optional[List[str]] = None):
+    args = build_predict_parser().parse_args(argv)
+    import numpy as np  # after parsing, so `predict --help` stays fast
 
     if not os.path.isfile(args.input):
         raise FileNotFoundError(f"Input file not found: {args.input}")
+    bundle = load_model_bundle(args.model)
+    cluster_names = bundle.get("cluster_names", {})
+    normalizers = bundle.get("normalizers", DEFAULT_NORMALIZERS)
 
-    df = load_excel(args.input, sheet_name=args.sheet)
-    if args.column not in df.columns:
-        raise ValueError(f"Column '{args.column}' not found in Excel. Available columns: {list(df.columns)}")
+    start = time.perf_counter()
+    labels = []
+    for chunk in iter_text_column(args.input, args.column, sheet_name=args.sheet, chunksize=args.chunksize):
+        labels.append(predict_labels(bundle, preprocess_texts(coerce_text_column(chunk), normalizers=normalizers)))
+    labels = np.concatenate(labels) if labels else np.array([], dtype=int)
+    elapsed = time.perf_counter() - start
+    print(f"Labelled {len(labels)} rows in {elapsed:.1f}s ({len(labels) / max(elapsed, 1e-9):.0f} rows/sec)")
 
-    text_series = coerce_text_column(df[args.column])
-    processed = preprocess_texts(text_series.tolist())
+    out_path = args.output or os.path.splitext(args.input)[0] + "_predicted.xlsx"
+    write_labelled_output(
+        args.input,
+        args.sheet,
+        out_path,
+        labels,
+        [cluster_names.get(int(l), "") for l in labels],
+        columns=args.output_columns,
+        key_column=args.key_column,
+        chunksize=args.chunksize,
+    )
 
-    # (No repeated-keyword extraction in this version)
 
-    # If all texts are empty after preprocessing, handle gracefully
-    if not any(s.strip() for s in processed):
-        print("Warning: all texts are empty after preprocessing. Creating a default label of -1 for all rows.")
-        df["cluster_label"] = -1
-        out_path = args.output or os.path.splitext(args.input)[0] + "_clustered.xlsx"
-        save_results_excel(df, out_path)
-        return
+def build_incremental_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cluster_tool.py incremental",
+        description="Label only the rows added or changed since the model was saved; refit when enough is new or the data drifts.",
+    )
+    parser.add_argument("--model", "-m", required=True, help="Model bundle saved by --save_model (updated in place)")
+    parser.add_argument("--input", "-i", required=True, help="Input file path (.xlsx, .xls, .csv or .parquet)")
+    parser.add_argument("--sheet", "-s", default=None, help="Sheet name or index (optional, Excel only)")
+    parser.add_argument("--column", "-c", default=None, help="Text column (default: the column the model was fitted on)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk when streaming the input")
+    parser.add_argument(
+        "--output", "-o", default=None, help="Output path (.xlsx, .csv or .parquet) — defaults to input + _clustered.xlsx"
+    )
+    parser.add_argument("--output_columns", choices=["all", "labels"], default="all", help="Write every input column, or only key + labels")
+    parser.add_argument("--key_column", default=None, help="Column kept with --output_columns labels (default: row position)")
+    parser.add_argument(
+        "--refit_fraction",
+        type=float,
+        default=0.25,
+        help="Refit once rows added since the last fit exceed this fraction of the fitted rows",
+    )
+    parser.add_argument(
+        "--drift_threshold",
+        type=float,
+        default=0.05,
+        help="Refit when new rows' mean centroid similarity falls this far below the fit's",
+    )
+    parser.add_argument("--refit", action="store_true", help="Refit now regardless of the thresholds")
+    return parser
+
+
+def incremental_main(argv: Optional[List[str]] = None):
+    args = build_incremental_parser().parse_args(argv)
+    import numpy as np
+
+    if not os.path.isfile(args.input):
+        raise FileNotFoundError(f"Input file not found: {args.input}")
+    bundle = load_model_bundle(args.model)
+    if "row_fingerprints" not in bundle:
+        raise ValueError(f"{args.model} has no row fingerprints; re-save it with --save_model from this version")
+    params = bundle["params"]
+    column = args.column if args.column is not None else params["column"]
+    out_path = args.output or os.path.splitext(args.input)[0] + "_clustered.xlsx"
+
+    start = time.perf_counter()
+    texts = coerce_text_column(load_text_column(args.input, column, sheet_name=args.sheet, chunksize=args.chunksize))
+    fingerprints = row_fingerprints(texts)
+
+    # Rows whose text was already labelled keep their label; everything else is new or changed
+    order = np.argsort(bundle["row_fingerprints"], kind="stable")
+    known_fps = bundle["row_fingerprints"][order]
+    pos = np.minimum(np.searchsorted(known_fps, fingerprints), max(len(known_fps) - 1, 0))
+    known = (known_fps[pos] == fingerprints) if len(known_fps) else np.zeros(len(fingerprints), dtype=bool)
+    new_idx = np.flatnonzero(~known)
+    rows_since_fit = bundle.get("rows_since_fit", 0) + len(new_idx)
+    print(f"{len(texts)} rows: {len(texts) - len(new_idx)} already labelled, {len(new_idx)} new or changed")
+
+    reason = None
+    if args.refit:
+        reason = "--refit"
+    elif rows_since_fit > args.refit_fraction * max(bundle.get("fit_rows", 0), 1):
+        reason = f"{rows_since_fit} rows added since the last fit (> {args.refit_fraction:.0%} of {bundle.get('fit_rows', 0)})"
+
+    labels = np.empty(len(texts), dtype=np.asarray(bundle["row_labels"]).dtype)
+    labels[known] = bundle["row_labels"][order][pos[known]]
+    if len(new_idx) and reason is None:
+        normalizers = bundle.get("normalizers", DEFAULT_NORMALIZERS)
+        processed = preprocess_texts(texts.iloc[new_idx], normalizers=normalizers)
+        labels[new_idx] = predict_labels(bundle, processed)
+        if "centroids" in bundle and "fit_similarity" in bundle:
+            similarity = float(centroid_similarity(bundle_transform(bundle, processed), bundle["centroids"]).mean())
+            drift = bundle["fit_similarity"] - similarity
+            print(f"New rows' mean centroid similarity {similarity:.4f} (fit: {bundle['fit_similarity']:.4f}, drift {drift:+.4f})")
+            if drift > args.drift_threshold:
+                reason = f"drift {drift:.4f} > {args.drift_threshold}"
+
+    if reason is not None:
+        print(f"Refitting: {reason}")
+        refit_args = build_parser().parse_args(["--input", args.input, "--column", str(column)])
+        for key, value in params.items():
+            if key in vars(refit_args):
+                setattr(refit_args, key, value)
+        refit_args.sheet, refit_args.column, refit_args.chunksize = args.sheet, column, args.chunksize
+        refit_args.output, refit_args.output_columns, refit_args.key_column = out_path, args.output_columns, args.key_column
+        refit_args.save_model, refit_args.model_path = True, args.model
+        refit_args.model_format = model_format_for_path(args.model)
+        refit_args.visualize, refit_args.profile_json, refit_args.profile_stage = False, None, []
+        return run_pipeline(refit_args, text_series=texts)
+
+    elapsed = time.perf_counter() - start
+    print(f"Labelled {len(new_idx)} new rows in {elapsed:.1f}s")
+    cluster_names = bundle.get("cluster_names", {})
+    out_path = write_labelled_output(
+        args.input,
+        args.sheet,
+        out_path,
+        labels,
+        [cluster_names.get(int(l), "") for l in labels],
+        columns=args.output_columns,
+        key_column=args.key_column,
+        chunksize=args.chunksize,
+    )
+    print(f"Saved merged results to: {out_path}")
 
-    vectorizer, X = vectorize_texts(processed, max_features=args.max_features)
+    bundle.update(row_fingerprints=fingerprints, row_labels=labels, rows_since_fit=rows_since_fit)
+    save_model_bundle(bundle, args.model)
+    print(f"Updated row fingerprints in: {args.model} ({rows_since_fit} rows since the last fit)")
 
-    model, labels = cluster_texts(
-        X, algorithm=args.algorithm, n_clusters=args.n_clusters, eps=args.eps, min_samples=args.min_samples
+
+BATCH_JOB_KEYS = ("input", "sheet", "column")
+
+
+def expand_manifest(manifest) -> List[dict]:
+    """Expand a batch manifest into one dict of CLI options per job.
+
+    The manifest is a list of job entries, or {"defaults": {...}, "jobs": [...]}. Keys are
+    cluster_tool option names (input, sheet, column, algorithm, n_clusters, ...). A list value
+    expands to one job per element, and several lists in one entry give their cartesian product.
+    """
+    import itertools
+
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for entry in manifest.get("jobs", []):
+        entry = {**defaults, **entry}
+        keys = list(entry)
+        values = [v if isinstance(v, list) else [v] for v in entry.values()]
+        for combo in itertools.product(*values):
+            jobs.append(dict(zip(keys, combo)))
+    return jobs
+
+
+def _batch_output_path(job: dict, output_dir: Optional[str], taken: set) -> str:
+    if job.get("output"):
+        return str(job["output"]).format(stem=os.path.splitext(os.path.basename(job["input"]))[0], **job)
+    parts = [os.path.splitext(os.path.basename(job["input"]))[0]]
+    if job.get("sheet") is not None:
+        parts.append(str(job["sheet"]))
+    parts += [str(job["column"]), str(job.get("algorithm", "kmeans"))]
+    if job.get("n_clusters") is not None:
+        parts.append(f"k{job['n_clusters']}")
+    base = os.path.join(output_dir or os.path.dirname(job["input"]), "_".join(parts))
+    path, n = base + "_clustered.xlsx", 1
+    while path in taken:
+        n += 1
+        path = f"{base}_{n}_clustered.xlsx"
+    return path
+
+
+def _job_args(job: dict):
+    """Parsed CLI args for one manifest job: parser defaults overridden by the job's keys."""
+    missing = [k for k in ("input", "column") if job.get(k) is None]
+    if missing:
+        raise ValueError(f"Batch job is missing {', '.join(missing)}: {job}")
+    args = build_parser().parse_args(["--input", str(job["input"]), "--column", str(job["column"])])
+    for key, value in job.items():
+        if key not in vars(args):
+            raise ValueError(f"Unknown option '{key}' in batch job {job}")
+        setattr(args, key, value)
+    error = check_args(args)
+    if error:
+        raise ValueError(error)
+    return args
+
+
+def _run_job_group(jobs: List[Tuple[int, dict]], log_dir: str) -> List[dict]:
+    """Run every job for one input file in this process, reading each sheet once.
+
+    The text columns needed by all jobs on a sheet are loaded in a single pass and reused.
+    Each job's console output goes to <log_dir>/job_<index>.log.
+    """
+    import contextlib
+    import traceback
+
+    loaded = {}
+    results = []
+    for index, job in jobs:
+        log_path = os.path.join(log_dir, f"job_{index:04d}.log")
+        result = {"index": index, **{k: job.get(k) for k in BATCH_JOB_KEYS}, "output": job.get("output"), "log": log_path}
+        start = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+            try:
+                args = _job_args(job)
+                if not args.streaming:
+                    sheet_key = (args.input, args.sheet)
+                    if sheet_key not in loaded or args.column not in loaded[sheet_key]:
+                        wanted = [
+                            j["column"] for _, j in jobs
+                            if j.get("column") is not None and (str(j.get("input")), j.get("sheet")) == sheet_key
+                        ]
+                        try:
+                            loaded[sheet_key] = load_text_columns(args.input, wanted, sheet_name=args.sheet, chunksize=args.chunksize)
+                        except ValueError:
+                            # another job names a missing column; load just this one so only that job fails
+                            loaded[sheet_key] = load_text_columns(args.input, [args.column], sheet_name=args.sheet, chunksize=args.chunksize)
+                    summary = run_pipeline(args, text_series=loaded[sheet_key][args.column])
+                else:
+                    summary = run_pipeline(args)
+                result.update(status="ok", output=summary["output"], rows=summary["rows"], clusters=summary["clusters"])
+                result["stages"] = summary["stages"]
+            except Exception as e:
+                traceback.print_exc(file=log)
+                result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        result["seconds"] = time.perf_counter() - start
+        results.append(result)
+    return results
+
+
+def run_batch(jobs: List[dict], n_jobs: int = 1, output_dir: Optional[str] = None, log_dir: Optional[str] = None) -> List[dict]:
+    """Run expanded manifest jobs over a pool of n_jobs processes.
+
+    Jobs are grouped by input file and each group runs in one worker, so a workbook is parsed
+    once per sheet no matter how many columns and parameter sets are clustered from it.
+    Failed jobs are reported, not raised. Results come back in manifest order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    log_dir = log_dir or tempfile.mkdtemp(prefix="text_analyzer_batch_")
+    os.makedirs(log_dir, exist_ok=True)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    taken = set()
+    groups: Dict[str, List[Tuple[int, dict]]] = {}
+    for index, job in enumerate(jobs):
+        job = dict(job)
+        if job.get("input") is not None:
+            job["output"] = _batch_output_path(job, output_dir, taken)
+            taken.add(job["output"])
+        groups.setdefault(os.path.abspath(str(job.get("input"))), []).append((index, job))
+
+    results = []
+    if n_jobs == 1 or len(groups) == 1:
+        for group in groups.values():
+            results.extend(_run_job_group(group, log_dir))
+    else:
+        workers = min(len(groups), n_jobs if n_jobs > 0 else os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for group_results in pool.map(_run_job_group, groups.values(), [log_dir] * len(groups)):
+                results.extend(group_results)
+    return sorted(results, key=lambda r: r["index"])
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cluster_tool.py batch",
+        description="Run many clustering jobs (files x sheets x columns x parameters) from a JSON manifest.",
     )
+    parser.add_argument("--manifest", "-m", required=True, help="JSON manifest of jobs (see docs/usage.md)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Worker processes (-1 = all cores); jobs on one file share a worker")
+    parser.add_argument("--output_dir", default=None, help="Directory for job outputs without an explicit 'output'")
+    parser.add_argument("--log_dir", default=None, help="Directory for per-job logs (default: a temporary directory)")
+    parser.add_argument("--report", default=None, help="Write the run report (per-job status and timings) to this JSON file")
+    return parser
+
+
+def batch_main(argv: Optional[List[str]] = None):
+    args = build_batch_parser().parse_args(argv)
+    with open(args.manifest, encoding="utf-8") as f:
+        jobs = expand_manifest(json.load(f))
+    print(f"Running {len(jobs)} jobs from {args.manifest}")
+    start = time.perf_counter()
+    results = run_batch(jobs, n_jobs=args.jobs, output_dir=args.output_dir, log_dir=args.log_dir)
+    wall = time.perf_counter() - start
+
+    print(f"{'job':>4} {'status':<7} {'seconds':>8}  {'input':<30} {'column':<20} output / error")
+    for r in results:
+        detail = r.get("output") if r["status"] == "ok" else r.get("error")
+        print(f"{r['index']:>4} {r['status']:<7} {r['seconds']:>8.2f}  {os.path.basename(str(r['input'])):<30} {str(r['column']):<20} {detail}")
+    failed = sum(r["status"] != "ok" for r in results)
+    print(f"{len(results) - failed} succeeded, {failed} failed in {wall:.1f}s")
+
+    if args.report:
+        report = {"manifest": args.manifest, "jobs_requested": len(jobs), "wall_seconds": wall, "failed": failed, "jobs": results}
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Saved batch report to: {args.report}")
+    if failed:
+        sys.exit(1)
+
+
+def check_args(args) -> Optional[str]:
+    """Return an error message for option combinations the pipeline does not support, else None."""
+    if args.streaming and args.algorithm != "minibatch_kmeans":
+        return "--streaming requires --algorithm minibatch_kmeans"
+    if args.output and os.path.splitext(args.output)[1].lower() not in OUTPUT_FORMATS:
+        return f"Unsupported output format for {args.output}. Use .xlsx, .csv or .parquet"
+    try:
+        parse_normalizers(args.normalize)
+    except ValueError as e:
+        return str(e)
+    if args.streaming and args.dedupe != "none":
+        return "--dedupe is not available with --streaming"
+    if args.streaming and args.lsa:
+        return "--lsa is not available with --streaming"
+    if args.fit_sample and (args.streaming or args.dedupe != "none"):
+        return "--fit_sample is not available with --streaming or --dedupe"
+    if args.sample_strata is not None and not args.fit_sample:
+        return "--sample_strata needs --fit_sample"
+    if args.min_cluster_size is not None and args.min_cluster_size < 2:
+        return "--min_cluster_size must be at least 2"
+    if args.auto_k:
+        if args.algorithm not in SWEEP_ALGORITHMS or args.streaming:
+            return f"--auto_k supports --algorithm {', '.join(SWEEP_ALGORITHMS)} (without --streaming)"
+        try:
+            parse_k_range(args.auto_k)
+        except ValueError as e:
+            return str(e)
+    return None
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "predict":
+        return predict_main(argv[1:])
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:])
+    if argv and argv[0] == "incremental":
+        return incremental_main(argv[1:])
+    if argv and argv[0] == "serve":
+        from cluster_service import serve_main
+
+        return serve_main(argv[1:])
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    error = check_args(args)
+    if error:
+        parser.error(error)
+    run_pipeline(args)
+
+
+def run_pipeline(args, text_series=None) -> dict:
+    """Run one clustering job described by parsed CLI args and return a summary of it.
+
+    text_series may hold the already loaded text column; batch mode uses this to read a
+    workbook once for every job on it. The summary has the output path, row and cluster
+    counts and the per-stage timings.
+    """
+    import numpy as np
 
-    df["cluster_label"] = labels
+    if not os.path.isfile(args.input):
+        raise FileNotFoundError(f"Input file not found: {args.input}")
 
     out_path = args.output or os.path.splitext(args.input)[0] + "_clustered.xlsx"
-    save_results_excel(df, out_path)
+    profiler = StageProfiler(args.profile_stage, cprofile_prefix=os.path.splitext(out_path)[0] + "_profile")
+    if args.streaming:
+        with profiler.stage("streaming"):
+            model, vectorizer, cluster_names, top_keywords, out_path = _run_streaming(args, out_path)
+        with profiler.stage("save_model"):
+            bundle = build_model_bundle(model, vectorizer, cluster_names, top_keywords, normalizers=args.normalize)
+            _save_model_if_requested(args, out_path, bundle)
+        _report_profile(args, profiler)
+        return {"output": out_path, "rows": None, "clusters": len(cluster_names), "stages": profiler.records}
+
+    # Only the text column is read for clustering; other columns are loaded when writing results
+    with profiler.stage("read"):
+        strata = None
+        if text_series is None and args.sample_strata is not None:
+            # one pass over the file for both columns
+            loaded = load_text_columns(
+                args.input, [args.column, args.sample_strata], sheet_name=args.sheet, chunksize=args.chunksize
+            )
+            text_series, strata = loaded[args.column], loaded[args.sample_strata]
+        elif args.sample_strata is not None:
+            strata = load_text_column(args.input, args.sample_strata, sheet_name=args.sheet, chunksize=args.chunksize)
+        if text_series is None:
+            text_series = load_text_column(args.input, args.column, sheet_name=args.sheet, chunksize=args.chunksize)
+        text_series = coerce_text_column(text_series)
+
+    # (No repeated-keyword extraction in this version)
+
+    # A sampled fit vectorizes a different subset on every run, so it is never cached
+    cache = None if args.no_cache or args.fit_sample else TfidfCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    cache_params = TfidfCache.vectorize_params(args.max_features, args.normalize, args.dtype)
+    # With --dedupe the row -> representative mapping is needed anyway, so the cache is keyed on the representatives
+    inverse = weights = X = fit_idx = None
+    if args.dedupe == "none":
+        with profiler.stage("cache"):
+            cache_key = TfidfCache.make_key(text_series, **cache_params) if cache else None
+            cached = cache.get(cache_key) if cache else None
+        if cached is not None:
+            vectorizer, X = cached
+            print(f"Loaded TF-IDF matrix from cache ({X.shape[0]} documents, {X.shape[1]} features)")
+    if X is None:
+        with profiler.stage("preprocess"):
+            processed = preprocess_texts(text_series, normalizers=args.normalize, n_jobs=args.preprocess_jobs)
+
+        # If all texts are empty after preprocessing, handle gracefully
+        if not any(s.strip() for s in processed):
+            print("Warning: all texts are empty after preprocessing. Creating a default label of -1 for all rows.")
+            with profiler.stage("write"):
+                out_path = write_labelled_output(
+                    args.input,
+                    args.sheet,
+                    out_path,
+                    np.full(len(text_series), -1),
+                    columns=args.output_columns,
+                    key_column=args.key_column,
+                    chunksize=args.chunksize,
+                )
+            _report_profile(args, profiler)
+            return {"output": out_path, "rows": len(text_series), "clusters": 0, "stages": profiler.records}
+
+        if args.fit_sample and len(processed) > args.fit_sample:
+            fit_idx = fit_sample_indices(len(processed), args.fit_sample, strata=strata)
+            rest_idx = np.setdiff1d(np.arange(len(processed)), fit_idx, assume_unique=True)
+            rest_texts = [processed[i] for i in rest_idx]
+            processed = [processed[i] for i in fit_idx]
+            kind = "stratified" if strata is not None else "random"
+            print(f"Fitting on a {kind} sample of {len(fit_idx)} of {len(text_series)} rows")
+
+        if args.dedupe != "none":
+            import pandas as pd
+
+            with profiler.stage("dedupe"):
+                processed, inverse, weights = dedupe_texts(processed, mode=args.dedupe, threshold=args.near_dup_threshold)
+            print(f"Collapsed {len(inverse)} rows into {len(processed)} unique texts ({args.dedupe} duplicates)")
+            with profiler.stage("cache"):
+                cache_params["dedupe"] = [args.dedupe, args.near_dup_threshold]
+                cache_key = TfidfCache.make_key(pd.Series(processed, dtype=object), **cache_params) if cache else None
+                cached = cache.get(cache_key) if cache else None
+            if cached is not None:
+                vectorizer, X = cached
+                print(f"Loaded TF-IDF matrix from cache ({X.shape[0]} documents, {X.shape[1]} features)")
+
+    if X is None:
+        with profiler.stage("vectorize"):
+            vectorizer, X = vectorize_texts(
+                processed, max_features=args.max_features, dtype=args.dtype, n_jobs=args.vectorize_jobs
+            )
+            if cache is not None:
+                try:
+                    cache.put(cache_key, vectorizer, X)
+                except OSError as e:
+                    print(f"Could not write TF-IDF cache: {e}")
+    if X.shape[0] < args.n_clusters and args.algorithm not in DENSITY_ALGORITHMS and not args.auto_k:
+        raise ValueError(f"n_clusters ({args.n_clusters}) exceeds the number of distinct texts ({X.shape[0]})")
+
+    # Z is what the clustering engines see: the TF-IDF matrix itself, or its dense LSA embedding
+    Z, reducer = X, None
+    if args.lsa:
+        with profiler.stage("lsa"):
+            reducer, Z, explained = fit_lsa(X, n_components=args.lsa)
+        print(f"LSA: {X.shape[1]} features -> {Z.shape[1]} components, explained variance {explained:.1%}")
+
+    if args.auto_k:
+        with profiler.stage("auto_k"):
+            results = sweep_k(
+                Z,
+                parse_k_range(args.auto_k),
+                algorithm=args.algorithm,
+                n_jobs=args.auto_k_jobs,
+                sample_size=args.auto_k_sample,
+                n_components=args.svd_components,
+                n_neighbors=args.n_neighbors,
+                batch_size=args.batch_size,
+            )
+        print(f"{'k':>4} {'silhouette':>11} {'calinski_h':>11} {'inertia':>12} {'seconds':>8}")
+        for r in results:
+            sil = "-" if r["silhouette"] is None else f"{r['silhouette']:.4f}"
+            ch = "-" if r["calinski_harabasz"] is None else f"{r['calinski_harabasz']:.1f}"
+            print(f"{r['k']:>4} {sil:>11} {ch:>11} {r['inertia']:>12.2f} {r['seconds']:>8.2f}")
+        args.n_clusters = choose_best_k(results, args.auto_k_metric)
+        print(f"Selected k={args.n_clusters} by {args.auto_k_metric}")
+        if args.visualize:
+            plot_k_sweep(results, best_k=args.n_clusters, out_path=os.path.splitext(out_path)[0] + "_auto_k.png")
+
+    with profiler.stage("cluster", algorithm=args.algorithm):
+        model, labels = cluster_texts(
+            Z,
+            algorithm=args.algorithm,
+            n_clusters=args.n_clusters,
+            eps=args.eps,
+            min_samples=args.min_samples,
+            min_cluster_size=args.min_cluster_size,
+            exact_neighbors=args.exact_neighbors,
+            n_components=args.svd_components,
+            n_neighbors=args.n_neighbors,
+            batch_size=args.batch_size,
+            sample_weight=weights,
+        )
+    elapsed = profiler.records[-1]["wall_s"]
+    summary = f"Clustered {X.shape[0]} docs in {elapsed:.1f}s ({X.shape[0] / max(elapsed, 1e-9):.0f} docs/sec)"
+    if hasattr(model, "inertia_"):
+        summary += f", inertia: {model.inertia_:.4f}"
+    print(summary)
+    # labels are per distinct text (or per sampled row); row_labels has one entry per input row
+    row_labels = labels[inverse] if inverse is not None else labels
+    bundle = None
+    if fit_idx is not None:
+        # Every row outside the sample goes through the same path as `predict`
+        bundle = build_model_bundle(
+            model, vectorizer, {}, {}, X=Z, labels=labels, normalizers=args.normalize, reducer=reducer
+        )
+        with profiler.stage("assign"):
+            rest_labels = assign_in_chunks(bundle, rest_texts, n_jobs=args.assign_jobs)
+        row_labels = np.empty(len(text_series), dtype=labels.dtype)
+        row_labels[fit_idx], row_labels[rest_idx] = labels, rest_labels
+        fit_s = sum(r["wall_s"] for r in profiler.records if r["stage"] in ("vectorize", "lsa", "auto_k", "cluster"))
+        assign_s = profiler.records[-1]["wall_s"]
+        print(
+            f"Fit on {len(fit_idx)} rows in {fit_s:.1f}s; assigned {len(rest_idx)} rows in {assign_s:.1f}s "
+            f"({len(rest_idx) / max(assign_s, 1e-9):.0f} rows/sec)"
+        )
 
     # Top keywords per cluster and assign descriptive names
     cluster_names = {}
+    top_keywords = {}
     try:
-        top_keywords = get_top_keywords_per_cluster(vectorizer, X, labels, top_n=args.top_n)
+        with profiler.stage("keywords"):
+            top_keywords = get_top_keywords_per_cluster(vectorizer, X, labels, top_n=args.top_n, sample_weight=weights)
+            # Assign human-readable cluster names
+            cluster_names = assign_cluster_names(
+                top_keywords, name_top_n=args.name_top_n, joiner=args.name_joiner, labels=labels
+            )
         print("Top keywords per cluster:")
         for cluster_id, terms in top_keywords.items():
             print(f"Cluster {cluster_id}: ", ", ".join([t for t, s in terms]))
 
-        # Assign human-readable cluster names
-        cluster_names = assign_cluster_names(top_keywords, name_top_n=args.name_top_n, joiner=args.name_joiner)
         print("Assigned cluster names:")
         for cid, name in cluster_names.items():
             print(f"  {cid} -> {name}")
 
-        # Map names into dataframe
-        df["cluster_name"] = [cluster_names.get(int(l), "") for l in labels]
+        # Map names onto rows
+        row_names = [cluster_names.get(int(l), "") for l in row_labels]
     except Exception as e:
         print(f"Could not compute top keywords or assign names: {e}")
-        df["cluster_name"] = ""
+        row_names = ""
+
+    with profiler.stage("write"):
+        out_path = write_labelled_output(
+            args.input,
+            args.sheet,
+            out_path,
+            row_labels,
+            row_names,
+            columns=args.output_columns,
+            key_column=args.key_column,
+            chunksize=args.chunksize,
+        )
 
     # Visualization
     if args.visualize:
         vis_out = os.path.splitext(out_path)[0] + f"_vis_{args.vis_method}.png"
         try:
-            visualize_embeddings(X, labels, method=args.vis_method, out_path=vis_out)
+            with profiler.stage("visualize"):
+                visualize_embeddings(
+                    Z,
+                    labels,
+                    method=args.vis_method,
+                    out_path=vis_out,
+                    max_points=args.vis_max_points,
+                    tsne_components=args.vis_tsne_components,
+                )
         except Exception as e:
             print(f"Visualization failed: {e}")
 
-    # Save model
     if args.save_model:
-        model_path = args.model_path or os.path.splitext(out_path)[0] + "_model.joblib"
+        with profiler.stage("save_model"):
+            if bundle is None:
+                bundle = build_model_bundle(
+                    model,
+                    vectorizer,
+                    cluster_names,
+                    top_keywords,
+                    X=Z,
+                    labels=labels,
+                    normalizers=args.normalize,
+                    sample_weight=weights,
+                    reducer=reducer,
+                )
+            else:
+                bundle.update(cluster_names=cluster_names, top_keywords=top_keywords)
+            bundle.update(incremental_state(text_series, row_labels, Z, bundle, vars(args), sample_weight=weights))
+            _save_model_if_requested(args, out_path, bundle)
+    _report_profile(args, profiler)
+    n_clusters = len(np.unique(labels[labels >= 0]))
+    return {"output": out_path, "rows": len(row_labels), "clusters": n_clusters, "stages": profiler.records}
+
+
+def _report_profile(args, profiler: StageProfiler):
+    """Print the per-stage summary and any cProfile output, and write --profile_json."""
+    print("Stage timings:")
+    print(profiler.summary())
+    for r in profiler.records:
+        if "cprofile_top" in r:
+            saved = f" (saved to {r['cprofile_path']})" if "cprofile_path" in r else ""
+            print(f"cProfile for stage {r['stage']}{saved}:")
+            print(r["cprofile_top"])
+    if args.profile_json:
         try:
-            # Save model, vectorizer, and cluster name/keymapping for reuse
-            joblib.dump({"model": model, "vectorizer": vectorizer, "cluster_names": cluster_names, "top_keywords": top_keywords}, model_path)
-            print(f"Saved model+vectorizer+names to: {model_path}")
-        except Exception as e:
-            print(f"Failed to save model: {e}")
+            profiler.to_json(args.profile_json)
+            print(f"Saved stage timings to: {args.profile_json}")
+        except OSError as e:
+            print(f"Could not write {args.profile_json}: {e}")
+
+
+def _save_model_if_requested(args, out_path: str, bundle: dict):
+    if not args.save_model:
+        return
+    suffix = "_model" if args.model_format == "compact" else "_model.joblib"
+    model_path = args.model_path or os.path.splitext(out_path)[0] + suffix
+    try:
+        # Save model, vectorizer, and cluster name/keymapping for reuse
+        save_model_bundle(bundle, model_path, model_format=args.model_format)
+        print(f"Saved model+vectorizer+names to: {model_path}")
+    except Exception as e:
+        print(f"Failed to save model: {e}")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,16 @@
 import os
+import queue
+from collections import OrderedDict
 import webbrowser
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import joblib
 from datetime import datetime
-import numpy as np
 
 from cluster_tool import (
-    load_excel,
+    list_sheets,
+    read_preview,
+    write_labelled_output,
     coerce_text_column,
     preprocess_texts,
     vectorize_texts,
@@ -16,10 +18,38 @@ from cluster_tool import (
     get_top_keywords_per_cluster,
     assign_cluster_names,
     visualize_embeddings,
-    save_results_excel,
+    build_model_bundle,
+    save_model_bundle,
+    load_model_bundle,
+    predict_labels,
+    iter_text_column,
+    TfidfCache,
+    parse_k_range,
+    sweep_k,
+    choose_best_k,
+    plot_k_sweep,
+    ALGORITHMS,
+    StageProfiler,
+    parse_normalizers,
+    NORMALIZERS,
+    DEFAULT_NORMALIZERS,
+    DEFAULT_DTYPE,
+    SWEEP_ALGORITHMS,
+    DENSITY_ALGORITHMS,
 )
 
 
+# Rows preprocessed between cancellation checks
+PREPROCESS_CHUNK = 50000
+# Rows shown in the sheet preview, and how many loaded text columns are kept in memory
+PREVIEW_ROWS = 20
+COLUMN_CACHE_SIZE = 4
+
+
+class OperationCancelled(Exception):
+    """Raised inside a worker when the user pressed Cancel"""
+
+
 class ClusterGUI:
     def __init__(self, master):
         self.master = master
@@ -60,7 +90,7 @@ class ClusterGUI:
         self.file_label = ttk.Label(file_row, text="No file selected", foreground="#666666", style="Header.TLabel")
         self.file_label.pack(side="left", fill="x", expand=True, padx=0, pady=4)
         
-        self.file_btn = ttk.Button(file_row, text="📂 Select Excel file...", command=self.select_file)
+        self.file_btn = ttk.Button(file_row, text="📂 Select input file...", command=self.select_file)
         self.file_btn.pack(side="right", padx=(6, 8), pady=4)
         
         # Sheet selection row
@@ -74,8 +104,21 @@ class ClusterGUI:
         self.sheet_menu = ttk.OptionMenu(sheet_row, self.sheet_var, "")
         self.sheet_menu.pack(side="left", padx=0, pady=4)
         
-        # Store file path for sheet loading
+        # Preview of the first rows of the selected sheet
+        preview_row = ttk.Frame(file_frame, style="Card.TFrame")
+        preview_row.pack(side="top", fill="x", padx=8, pady=(0, 8))
+        self.preview = ttk.Treeview(preview_row, show="headings", height=5)
+        self.preview.pack(side="top", fill="x", expand=True)
+        preview_scroll = ttk.Scrollbar(preview_row, orient="horizontal", command=self.preview.xview)
+        preview_scroll.pack(side="top", fill="x")
+        self.preview.configure(xscrollcommand=preview_scroll.set)
+        
+        # Store file path and sheet for column loading
         self.current_file_path = None
+        self.current_sheet = None
+        # Memoized per (path, mtime, sheet): header preview; per (path, mtime, sheet, column): loaded texts
+        self.sheet_cache = {}
+        self.column_cache = OrderedDict()
 
         # ===== PARAMETERS FRAME ====
         params_frame = ttk.LabelFrame(master, text="⚙️  Clustering Parameters", style="TLabelframe", padding=12)
@@ -90,7 +133,7 @@ class ClusterGUI:
         ttk.Label(params_frame, text="Algorithm:", style="Section.TLabel").grid(row=0, column=2, sticky="e", padx=8, pady=6)
         self.alg_var = tk.StringVar(master)
         self.alg_var.set("kmeans")
-        ttk.OptionMenu(params_frame, self.alg_var, "kmeans", "kmeans", "dbscan", "agglomerative").grid(row=0, column=3, sticky="w", padx=8, pady=6)
+        ttk.OptionMenu(params_frame, self.alg_var, "kmeans", *ALGORITHMS).grid(row=0, column=3, sticky="w", padx=8, pady=6)
         
         # Row 2: n_clusters, name top N
         ttk.Label(params_frame, text="n_clusters:", style="Section.TLabel").grid(row=1, column=0, sticky="e", padx=8, pady=6)
@@ -116,10 +159,31 @@ class ClusterGUI:
         self.vis_var.set("pca")
         ttk.OptionMenu(params_frame, self.vis_var, "pca", "pca", "tsne").grid(row=2, column=3, sticky="w", padx=8, pady=6)
         
-        # Row 4: Output file (full width)
-        ttk.Label(params_frame, text="Output file:", style="Section.TLabel").grid(row=3, column=0, sticky="e", padx=8, pady=6)
+        # Row 4: auto k sweep
+        ttk.Label(params_frame, text="Auto k range:", style="Section.TLabel").grid(row=3, column=0, sticky="e", padx=8, pady=6)
+        self.auto_k_entry = ttk.Entry(params_frame, width=10)
+        self.auto_k_entry.insert(0, "2:10")
+        self.auto_k_entry.grid(row=3, column=1, sticky="w", padx=8, pady=6)
+        self.auto_k_btn = ttk.Button(params_frame, text="🔍  Find best k", command=self.auto_k_thread)
+        self.auto_k_btn.grid(row=3, column=2, columnspan=2, sticky="w", padx=8, pady=6)
+        
+        # Row 5: preprocessing normalizers, applied in order
+        ttk.Label(params_frame, text="Normalize:", style="Section.TLabel").grid(row=4, column=0, sticky="e", padx=8, pady=6)
+        self.normalize_entry = ttk.Entry(params_frame)
+        self.normalize_entry.insert(0, ",".join(DEFAULT_NORMALIZERS))
+        self.normalize_entry.grid(row=4, column=1, sticky="ew", padx=8, pady=6)
+        ttk.Label(params_frame, text=", ".join(NORMALIZERS), foreground="#777777").grid(row=4, column=2, columnspan=2, sticky="w", padx=8, pady=6)
+
+        # Row 6: TF-IDF vocabulary size
+        ttk.Label(params_frame, text="Max features:", style="Section.TLabel").grid(row=5, column=0, sticky="e", padx=8, pady=6)
+        self.max_features_entry = ttk.Entry(params_frame, width=10)
+        self.max_features_entry.insert(0, "2000")
+        self.max_features_entry.grid(row=5, column=1, sticky="w", padx=8, pady=6)
+
+        # Row 7: Output file (full width)
+        ttk.Label(params_frame, text="Output file:", style="Section.TLabel").grid(row=6, column=0, sticky="e", padx=8, pady=6)
         self.out_entry = ttk.Entry(params_frame)
-        self.out_entry.grid(row=3, column=1, columnspan=3, sticky="ew", padx=8, pady=6)
+        self.out_entry.grid(row=6, column=1, columnspan=3, sticky="ew", padx=8, pady=6)
         params_frame.columnconfigure(1, weight=1)
 
         # ===== ACTION BUTTONS FRAME =====
@@ -138,6 +202,12 @@ class ClusterGUI:
         self.save_model_btn = ttk.Button(btn_frame, text="💾  Save Model", command=self.save_model, state="disabled")
         self.save_model_btn.pack(side="left", padx=4)
         
+        self.apply_model_btn = ttk.Button(btn_frame, text="📦  Apply Model", command=self.apply_model_thread)
+        self.apply_model_btn.pack(side="left", padx=4)
+        
+        self.cancel_btn = ttk.Button(btn_frame, text="⏹️  Cancel", command=self.cancel_run, state="disabled")
+        self.cancel_btn.pack(side="left", padx=4)
+        
         self.clear_log_btn = ttk.Button(btn_frame, text="🗑️  Clear Log", command=self.clear_log)
         self.clear_log_btn.pack(side="left", padx=4)
 
@@ -192,13 +262,24 @@ class ClusterGUI:
         master.rowconfigure(4, weight=1)
         master.rowconfigure(7, weight=0)
 
-        self.df = None
         self.labels = None
         self.cluster_names = {}
         self.top_keywords = {}
         self.X = None
         self.model = None
         self.vectorizer = None
+        self.normalizers = DEFAULT_NORMALIZERS
+        # Background work: workers never touch Tk widgets; they post to ui_queue, drained by _poll_queue
+        self.ui_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
+        self.master.after(100, self._poll_queue)
+
+        # Re-running with only clustering parameters changed reuses the cached TF-IDF matrix
+        try:
+            self.tfidf_cache = TfidfCache()
+        except OSError:
+            self.tfidf_cache = None
 
     def _configure_styles(self):
         """Configure professional styling for ttk widgets"""
@@ -241,19 +322,94 @@ class ClusterGUI:
         self.master.configure(bg=bg_color)
     
     def _on_alg_change(self, *args):
-        if self.alg_var.get() == "dbscan":
+        if self.alg_var.get() in DENSITY_ALGORITHMS:
             self.k_entry.config(state="disabled")
         else:
             self.k_entry.config(state="normal")
 
     def log_msg(self, msg: str):
-        """Log a message with timestamp"""
+        """Log a message with timestamp (safe to call from worker threads)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         formatted_msg = f"[{timestamp}] {msg}"
+        if threading.current_thread() is not threading.main_thread():
+            self.ui_queue.put(("log", formatted_msg))
+            return
         self.log.insert(tk.END, formatted_msg + "\n")
         self.log.see(tk.END)
-        self.master.update_idletasks()
     
+    def _set_progress(self, value):
+        self.ui_queue.put(("progress", value))
+
+    def _ui(self, func, *args):
+        """Run func(*args) on the Tk main thread"""
+        self.ui_queue.put(("call", (func, args)))
+
+    def _poll_queue(self):
+        try:
+            for _ in range(500):
+                kind, payload = self.ui_queue.get_nowait()
+                if kind == "log":
+                    self.log.insert(tk.END, payload + "\n")
+                    self.log.see(tk.END)
+                elif kind == "progress":
+                    self.progress["value"] = payload
+                elif kind == "call":
+                    func, args = payload
+                    try:
+                        func(*args)
+                    except Exception as e:
+                        # report and keep draining; one bad callback must not stop the polling loop
+                        self.log_msg(f"✗ UI update failed: {e}")
+        except queue.Empty:
+            pass
+        finally:
+            self.master.after(100, self._poll_queue)
+
+    def _check_cancel(self):
+        if self.cancel_event.is_set():
+            raise OperationCancelled()
+
+    def _start_worker(self, target, *args):
+        """Run target(*args) on a background thread with the run buttons disabled and Cancel enabled"""
+        if self.worker is not None and self.worker.is_alive():
+            messagebox.showwarning("Busy", "Another operation is still running")
+            return
+        self.cancel_event.clear()
+        for btn in (self.run_btn, self.apply_model_btn, self.auto_k_btn, self.save_btn, self.vis_btn, self.save_model_btn):
+            btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self.progress["value"] = 0
+        self.progress.grid()
+        self.worker = threading.Thread(target=self._worker_main, args=(target, args), daemon=True)
+        self.worker.start()
+
+    def _worker_main(self, target, args):
+        try:
+            target(*args)
+        except OperationCancelled:
+            self.log_msg("⏹ Operation cancelled")
+        except Exception as e:
+            self.log_msg(f"✗ {str(e)}")
+            self._ui(messagebox.showerror, "Error", str(e))
+        finally:
+            self._ui(self._worker_finished)
+
+    def _worker_finished(self):
+        self.run_btn.config(state="normal")
+        self.apply_model_btn.config(state="normal")
+        self.auto_k_btn.config(state="normal")
+        self.cancel_btn.config(state="disabled")
+        self.progress.grid_remove()
+        if self.labels is not None:
+            self.save_btn.config(state="normal")
+            self.save_model_btn.config(state="normal" if self.model is not None and self.X is not None else "disabled")
+            self.vis_btn.config(state="normal" if self.X is not None else "disabled")
+
+    def cancel_run(self):
+        if self.worker is not None and self.worker.is_alive():
+            self.cancel_event.set()
+            self.log_msg("Cancelling... (stops at the next checkpoint)")
+
     def clear_log(self):
         """Clear the log window"""
         self.log.delete("1.0", tk.END)
@@ -424,10 +580,18 @@ FOUNDATION (v0.1):
         win.geometry(f"1000x750+{x + max(10, w//12)}+{y + max(10, h//12)}")
 
     def select_file(self):
-        path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx;*.xls")])
+        path = filedialog.askopenfilename(
+            filetypes=[
+                ("Supported files", "*.xlsx;*.xlsm;*.xls;*.csv;*.tsv;*.parquet"),
+                ("Excel files", "*.xlsx;*.xlsm;*.xls"),
+                ("CSV files", "*.csv;*.tsv"),
+                ("Parquet files", "*.parquet"),
+            ]
+        )
         if not path:
             return
         self.current_file_path = path
+        self.current_sheet = None
         self.file_label.config(text=path)
         # Update the window title to include the selected file for easier identification
         try:
@@ -439,58 +603,233 @@ FOUNDATION (v0.1):
         self.out_entry.delete(0, tk.END)
         base, ext = os.path.splitext(path)
         self.out_entry.insert(0, base + "_clustered.xlsx")
-        
-        # Load sheet names
+        self.log_msg(f"Reading {os.path.basename(path)}...")
+        # Sheet enumeration happens off the UI thread (CSV/Parquet inputs have no sheets)
+        threading.Thread(target=self._list_sheets_worker, args=(path,), daemon=True).start()
+
+    def _list_sheets_worker(self, path):
         try:
-            import openpyxl
-            workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
-            sheet_names = workbook.sheetnames
-            workbook.close()
-            
-            # Populate sheet dropdown
-            menu = self.sheet_menu["menu"]
-            menu.delete(0, "end")
-            for sheet in sheet_names:
-                menu.add_command(label=sheet, command=lambda value=sheet: self._load_sheet(value))
-            
-            # Auto-select first sheet
-            if sheet_names:
-                self.sheet_var.set(sheet_names[0])
-                self._load_sheet(sheet_names[0])
-            
-            self.log_msg(f"✓ Found {len(sheet_names)} sheet(s): {', '.join(sheet_names)}")
+            sheet_names = list_sheets(path)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to read Excel sheets: {e}")
             self.log_msg(f"✗ Error reading sheets: {e}")
+            self._ui(messagebox.showerror, "Error", f"Failed to read input file: {e}")
+            return
+        self._ui(self._show_sheets, path, sheet_names)
+
+    def _show_sheets(self, path, sheet_names):
+        if path != self.current_file_path:
+            return  # another file was selected meanwhile
+        # Populate sheet dropdown
+        menu = self.sheet_menu["menu"]
+        menu.delete(0, "end")
+        for sheet in sheet_names:
+            menu.add_command(label=sheet, command=lambda value=sheet: self._load_sheet(value))
+        
+        # Auto-select first sheet
+        if sheet_names:
+            self.log_msg(f"✓ Found {len(sheet_names)} sheet(s): {', '.join(sheet_names)}")
+            self._load_sheet(sheet_names[0])
+        else:
+            self.sheet_var.set("")
+            self._load_sheet(None)
     
+    def _sheet_key(self, sheet_name):
+        return (self.current_file_path, os.path.getmtime(self.current_file_path), sheet_name)
+
     def _load_sheet(self, sheet_name):
-        """Load data from the selected sheet"""
+        """Show the columns and first rows of the selected sheet; the text column itself is loaded on run"""
         if not self.current_file_path:
             return
+        if sheet_name is not None:
+            self.sheet_var.set(sheet_name)
+        self.current_sheet = sheet_name
+        self.labels = None
         try:
-            df = load_excel(self.current_file_path, sheet_name=sheet_name)
-            self.df = df
-            cols = list(df.columns)
-            menu = self.col_menu["menu"]
-            menu.delete(0, "end")
-            for c in cols:
-                menu.add_command(label=c, command=lambda value=c: self.col_var.set(value))
-            if cols:
-                self.col_var.set(cols[0])
-            file_size_kb = os.path.getsize(self.current_file_path) / 1024
-            self.log_msg(f"✓ Loaded sheet '{sheet_name}': {len(df)} rows, {len(cols)} columns, {file_size_kb:.1f} KB")
-            self.log_msg(f"  Columns: {', '.join(cols)}")
-        except Exception as e:
+            key = self._sheet_key(sheet_name)
+        except OSError as e:
             messagebox.showerror("Error", f"Failed to load sheet: {e}")
+            return
+        if key in self.sheet_cache:
+            self._show_sheet(key, self.sheet_cache[key])
+            return
+        threading.Thread(target=self._preview_worker, args=(key,), daemon=True).start()
+
+    def _preview_worker(self, key):
+        path, _, sheet_name = key
+        try:
+            preview = read_preview(path, sheet_name=sheet_name, n_rows=PREVIEW_ROWS)
+        except Exception as e:
             self.log_msg(f"✗ Error loading sheet: {e}")
+            self._ui(messagebox.showerror, "Error", f"Failed to load sheet: {e}")
+            return
+        self._ui(self._show_sheet, key, preview)
+
+    def _show_sheet(self, key, preview):
+        path, _, sheet_name = key
+        self.sheet_cache[key] = preview
+        if path != self.current_file_path or sheet_name != self.current_sheet:
+            return  # selection changed while the preview was loading
+        cols = list(preview.columns)
+        menu = self.col_menu["menu"]
+        menu.delete(0, "end")
+        for c in cols:
+            menu.add_command(label=c, command=lambda value=c: self.col_var.set(value))
+        if cols:
+            self.col_var.set(cols[0])
+
+        self.preview.delete(*self.preview.get_children())
+        self.preview["columns"] = [str(c) for c in cols]
+        for c in cols:
+            self.preview.heading(str(c), text=str(c))
+            self.preview.column(str(c), width=140, stretch=False)
+        for row in preview.itertuples(index=False, name=None):
+            self.preview.insert("", "end", values=["" if v is None or v != v else str(v)[:200] for v in row])
+
+        file_size_kb = os.path.getsize(path) / 1024
+        where = f"sheet '{sheet_name}'" if sheet_name is not None else os.path.basename(path)
+        self.log_msg(f"✓ Loaded {where}: {len(cols)} columns, {file_size_kb:.1f} KB (showing first {len(preview)} rows)")
+        self.log_msg(f"  Columns: {', '.join(str(c) for c in cols)}")
+
+    def _load_texts(self, path, col, sheet_name):
+        """Worker side: load (or reuse) the coerced text column of the given file and sheet"""
+        key = (path, os.path.getmtime(path), sheet_name, col)
+        if key in self.column_cache:
+            self.column_cache.move_to_end(key)
+            self.log_msg(f"Using already loaded column '{col}'")
+            return self.column_cache[key]
+        self.log_msg(f"Loading column '{col}'...")
+        texts = []
+        for chunk in iter_text_column(path, col, sheet_name=sheet_name):
+            self._check_cancel()
+            texts.extend(coerce_text_column(chunk).tolist())
+        self.column_cache[key] = texts
+        while len(self.column_cache) > COLUMN_CACHE_SIZE:
+            self.column_cache.popitem(last=False)
+        return texts
+
+    def _read_normalizers(self):
+        """Main thread: parse the Normalize entry, or show an error and return None"""
+        try:
+            return parse_normalizers(self.normalize_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid input", str(e))
+            return None
 
-    def run_clustering_thread(self):
-        t = threading.Thread(target=self.run_clustering)
-        t.start()
+    def _read_max_features(self):
+        """Main thread: parse the Max features entry, or show an error and return None"""
+        try:
+            max_features = int(self.max_features_entry.get() or 2000)
+        except ValueError as e:
+            messagebox.showerror("Invalid input", f"Max features must be a whole number: {e}")
+            return None
+        if max_features < 1:
+            messagebox.showwarning("Invalid parameter", "Max features must be at least 1")
+            return None
+        return max_features
+
+    def _load_and_vectorize(self, path, col, sheet_name, profiler, normalizers, max_features):
+        """Worker side: load the text column in chunks and return (vectorizer, X), using the TF-IDF cache"""
+        with profiler.stage("read"):
+            texts = self._load_texts(path, col, sheet_name)
+        self._set_progress(10)
+
+        with profiler.stage("cache"):
+            params = TfidfCache.vectorize_params(max_features, normalizers, DEFAULT_DTYPE)
+            cache_key = self.tfidf_cache.make_key(texts, **params) if self.tfidf_cache else None
+            cached = self.tfidf_cache.get(cache_key) if self.tfidf_cache else None
+        if cached is not None:
+            self.log_msg("Loaded TF-IDF matrix from cache")
+            return cached
+        self.log_msg("Preprocessing texts...")
+        processed = []
+        with profiler.stage("preprocess"):
+            for start in range(0, len(texts), PREPROCESS_CHUNK):
+                self._check_cancel()
+                # sub-chunks let expensive normalizers (stem) spread each chunk over all cores
+                processed.extend(
+                    preprocess_texts(
+                        texts[start : start + PREPROCESS_CHUNK],
+                        normalizers=normalizers,
+                        n_jobs=-1,
+                        chunksize=max(1000, PREPROCESS_CHUNK // (os.cpu_count() or 1)),
+                    )
+                )
+        self._set_progress(20)
+
+        self._check_cancel()
+        self.log_msg("Vectorizing texts...")
+        with profiler.stage("vectorize"):
+            vectorizer, X = vectorize_texts(processed, max_features=max_features, dtype=DEFAULT_DTYPE, n_jobs=-1)
+            if self.tfidf_cache is not None:
+                try:
+                    self.tfidf_cache.put(cache_key, vectorizer, X)
+                except OSError as e:
+                    self.log_msg(f"  Could not write TF-IDF cache: {e}")
+        self._set_progress(50)
+        return vectorizer, X
+
+    def _log_profile(self, profiler):
+        """Write the per-stage wall/CPU/peak-RSS table to the log"""
+        self.log_msg("Stage timings:")
+        for line in profiler.summary().splitlines():
+            self.log_msg(f"  {line}")
+
+    def auto_k_thread(self):
+        if self.current_file_path is None:
+            messagebox.showwarning("No file", "Please select an input file first")
+            return
+        col = self.col_var.get()
+        if not col:
+            messagebox.showwarning("No column", "Please select a text column")
+            return
+        alg = self.alg_var.get()
+        if alg not in SWEEP_ALGORITHMS:
+            messagebox.showwarning("Not supported", f"Auto k works with: {', '.join(SWEEP_ALGORITHMS)}")
+            return
+        try:
+            k_values = parse_k_range(self.auto_k_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Invalid input", str(e))
+            return
+        normalizers = self._read_normalizers()
+        if normalizers is None:
+            return
+        max_features = self._read_max_features()
+        if max_features is None:
+            return
+        self._start_worker(
+            self.run_auto_k, self.current_file_path, col, self.current_sheet, alg, k_values, normalizers, max_features
+        )
+
+    def run_auto_k(self, path, col, sheet_name, alg, k_values, normalizers, max_features):
+        """Worker: vectorize once, fit every candidate k in parallel and pick the best by silhouette"""
+        self.log_msg("="*60)
+        self.log_msg(f"Sweeping k over {k_values[0]}..{k_values[-1]} ({alg})")
+        profiler = StageProfiler()
+        vectorizer, X = self._load_and_vectorize(path, col, sheet_name, profiler, normalizers, max_features)
+        self._check_cancel()
+        with profiler.stage("auto_k"):
+            results = sweep_k(X, k_values, algorithm=alg)
+        self._check_cancel()
+        self._set_progress(100)
+        self._log_profile(profiler)
+        for r in results:
+            sil = "-" if r["silhouette"] is None else f"{r['silhouette']:.4f}"
+            self.log_msg(f"  k={r['k']}: silhouette {sil}, inertia {r['inertia']:.2f}, {r['seconds']:.2f}s")
+        best_k = choose_best_k(results, "silhouette")
+        self.log_msg(f"✓ Best k by silhouette: {best_k}")
+        self._ui(self._set_k, best_k)
+        # matplotlib windows must be opened from the Tk main thread
+        self._ui(plot_k_sweep, results, best_k)
+
+    def _set_k(self, k):
+        self.k_entry.delete(0, tk.END)
+        self.k_entry.insert(0, str(k))
 
-    def run_clustering(self):
-        if self.df is None:
-            messagebox.showwarning("No file", "Please select an Excel file first")
+    def run_clustering_thread(self):
+        """Validate parameters on the main thread, then run the pipeline on a worker"""
+        if self.current_file_path is None:
+            messagebox.showwarning("No file", "Please select an input file first")
             return
         col = self.col_var.get()
         if not col:
@@ -503,9 +842,6 @@ FOUNDATION (v0.1):
             if n_clusters < 2:
                 messagebox.showwarning("Invalid parameter", "n_clusters must be at least 2")
                 return
-            if n_clusters > len(self.df):
-                messagebox.showwarning("Invalid parameter", f"n_clusters ({n_clusters}) cannot exceed data size ({len(self.df)})")
-                return
             top_n = int(self.name_top_entry.get() or 3)
             if top_n < 1:
                 messagebox.showwarning("Invalid parameter", "name top N must be at least 1")
@@ -514,77 +850,85 @@ FOUNDATION (v0.1):
             messagebox.showerror("Invalid input", f"Please enter valid numbers for parameters: {e}")
             return
 
-        try:
-            self.run_btn.config(state="disabled")
-            self.save_btn.config(state="disabled")
-            self.vis_btn.config(state="disabled")
-            self.save_model_btn.config(state="disabled")
-            self.progress.grid()
-            self.progress["value"] = 0
-
-            self.log_msg("="*60)
-            self.log_msg(f"Starting clustering (Algorithm: {self.alg_var.get()}, n_clusters: {n_clusters})")
-            self.progress["value"] = 5
-            self.master.update_idletasks()
-            texts = coerce_text_column(self.df[col]).tolist()
-
-            self.log_msg("Preprocessing texts...")
-            self.progress["value"] = 10
-            self.master.update_idletasks()
-            processed = preprocess_texts(texts)
-
-            self.log_msg("Vectorizing texts...")
-            self.progress["value"] = 30
-            self.master.update_idletasks()
-            vectorizer, X = vectorize_texts(processed)
-            self.X = X
-            self.vectorizer = vectorizer
-            self.log_msg(f"  Vectorizer created: {X.shape[0]} documents, {X.shape[1]} features")
-
-            self.log_msg("Clustering texts...")
-            self.progress["value"] = 70
-            self.master.update_idletasks()
-            alg = self.alg_var.get()
+        normalizers = self._read_normalizers()
+        if normalizers is None:
+            return
+        max_features = self._read_max_features()
+        if max_features is None:
+            return
+
+        params = {
+            "file_path": self.current_file_path,
+            "col": col,
+            "sheet_name": self.current_sheet,
+            "algorithm": self.alg_var.get(),
+            "n_clusters": n_clusters,
+            "name_top_n": top_n,
+            "joiner": self.joiner_entry.get(),
+            "normalizers": normalizers,
+            "max_features": max_features,
+        }
+        self._start_worker(self.run_clustering, params)
+
+    def run_clustering(self, params):
+        """Worker: the clustering pipeline. Reports through the UI queue and stops at cancel checkpoints"""
+        import numpy as np
+
+        alg = params["algorithm"]
+        n_clusters = params["n_clusters"]
+        self.log_msg("="*60)
+        self.log_msg(f"Starting clustering (Algorithm: {alg}, n_clusters: {n_clusters})")
+        self._set_progress(5)
+        profiler = StageProfiler()
+        vectorizer, X = self._load_and_vectorize(
+            params["file_path"], params["col"], params["sheet_name"], profiler, params["normalizers"], params["max_features"]
+        )
+        if n_clusters > X.shape[0] and alg not in DENSITY_ALGORITHMS:
+            raise ValueError(f"n_clusters ({n_clusters}) cannot exceed data size ({X.shape[0]})")
+        self.log_msg(f"  Vectorizer created: {X.shape[0]} documents, {X.shape[1]} features")
+
+        self._check_cancel()
+        self.log_msg("Clustering texts...")
+        with profiler.stage("cluster", algorithm=alg):
             model, labels = cluster_texts(X, algorithm=alg, n_clusters=n_clusters)
-            self.model = model
-            self.labels = labels
-            self.df["cluster_label"] = labels
-            
-            # Show cluster statistics
-            unique_labels = np.unique(labels)
-            self.log_msg(f"  Clusters found: {len(unique_labels)}")
-            for label in unique_labels:
-                count = np.sum(labels == label)
-                percentage = (count / len(labels)) * 100
-                self.log_msg(f"    Cluster {label}: {count} items ({percentage:.1f}%)")
-
-            # top keywords and names
-            self.log_msg("Extracting top keywords...")
-            self.progress["value"] = 90
-            self.master.update_idletasks()
-            self.top_keywords = get_top_keywords_per_cluster(vectorizer, X, labels, top_n=10)
-            self.cluster_names = assign_cluster_names(self.top_keywords, name_top_n=top_n, joiner=self.joiner_entry.get())
-            
-            self.log_msg("Suggested cluster names:")
-            for cid, name in self.cluster_names.items():
-                self.log_msg(f"  {cid}: {name}")
-
-            # populate editable names
-            self.populate_name_entries()
-
-            self.log_msg("✓ Clustering finished! Edit names below and click 'Save results'")
-            self.progress["value"] = 100
-            self.master.update_idletasks()
-            # enable save btn
-            self.save_btn.config(state="normal")
-            self.vis_btn.config(state="normal")
-            self.save_model_btn.config(state="normal")
-        except Exception as e:
-            self.log_msg(f"✗ Clustering error: {str(e)}")
-            messagebox.showerror("Error during clustering", str(e))
-        finally:
-            self.run_btn.config(state="normal")
-            self.progress.grid_remove()
+        self._check_cancel()
+        self._set_progress(80)
+        
+        # Show cluster statistics
+        unique_labels = np.unique(labels)
+        self.log_msg(f"  Clusters found: {len(unique_labels)}")
+        for label in unique_labels:
+            count = np.sum(labels == label)
+            percentage = (count / len(labels)) * 100
+            self.log_msg(f"    Cluster {label}: {count} items ({percentage:.1f}%)")
+
+        # top keywords and names
+        self.log_msg("Extracting top keywords...")
+        with profiler.stage("keywords"):
+            top_keywords = get_top_keywords_per_cluster(vectorizer, X, labels, top_n=10)
+            cluster_names = assign_cluster_names(
+                top_keywords, name_top_n=params["name_top_n"], joiner=params["joiner"], labels=labels
+            )
+        self._check_cancel()
+        self._set_progress(100)
+        
+        self.log_msg("Suggested cluster names:")
+        for cid, name in cluster_names.items():
+            self.log_msg(f"  {cid}: {name}")
+        self._log_profile(profiler)
+        self._ui(self._apply_results, X, vectorizer, model, labels, top_keywords, cluster_names, params["normalizers"])
+        self.log_msg("✓ Clustering finished! Edit names below and click 'Save results'")
+
+    def _apply_results(self, X, vectorizer, model, labels, top_keywords, cluster_names, normalizers):
+        """Main thread: publish a finished run to the GUI state and the name editor"""
+        self.normalizers = normalizers
+        self.X = X
+        self.vectorizer = vectorizer
+        self.model = model
+        self.labels = labels
+        self.top_keywords = top_keywords
+        self.cluster_names = cluster_names
+        self.populate_name_entries()
 
     def populate_name_entries(self):
         # Clear frame
@@ -617,7 +961,7 @@ FOUNDATION (v0.1):
             messagebox.showerror("Visualization failed", str(e))
 
     def save_with_names(self):
-        if self.df is None or self.labels is None:
+        if self.labels is None:
             messagebox.showwarning("Nothing to save", "Run clustering first")
             return
         # read edited names
@@ -629,19 +973,20 @@ FOUNDATION (v0.1):
                 return
             final_names[cid] = name
 
-        # apply to df
-        self.df["cluster_name"] = [final_names.get(int(l), "") for l in self.labels]
         out = self.out_entry.get().strip()
         if not out:
             messagebox.showwarning("No output", "Provide an output filepath")
             return
-        try:
-            save_results_excel(self.df, out)
-            self.log_msg(f"✓ Results saved to {out}")
-            messagebox.showinfo("Saved", f"Saved results to {out}")
-        except Exception as e:
-            self.log_msg(f"✗ Save failed: {str(e)}")
-            messagebox.showerror("Save failed", str(e))
+        row_names = [final_names.get(int(l), "") for l in self.labels]
+        self._start_worker(self._save_results_job, self.current_file_path, self.current_sheet, out, self.labels, row_names)
+
+    def _save_results_job(self, path, sheet_name, out, labels, row_names):
+        """Worker: stream the input and write it with the two label columns appended"""
+        self.log_msg(f"Saving results to {out}...")
+        out = write_labelled_output(path, sheet_name, out, labels, row_names)
+        self._set_progress(100)
+        self.log_msg(f"✓ Results saved to {out}")
+        self._ui(messagebox.showinfo, "Saved", f"Saved results to {out}")
 
     def save_model(self):
         if self.model is None or self.vectorizer is None:
@@ -650,28 +995,75 @@ FOUNDATION (v0.1):
 
         path = filedialog.asksaveasfilename(
             defaultextension=".joblib",
-            filetypes=[("Joblib files", "*.joblib")],
+            filetypes=[("Joblib files", "*.joblib"), ("Compact model (folder)", "*.model")],
             title="Save Clustering Model"
         )
         if not path:
             return
 
         try:
-            joblib.dump(
-                {
-                    "model": self.model,
-                    "vectorizer": self.vectorizer,
-                    "cluster_names": self.cluster_names,
-                    "top_keywords": self.top_keywords,
-                },
-                path,
+            bundle = build_model_bundle(
+                self.model,
+                self.vectorizer,
+                self.cluster_names,
+                self.top_keywords,
+                X=self.X,
+                labels=self.labels,
+                normalizers=self.normalizers,
             )
+            save_model_bundle(bundle, path)
             self.log_msg(f"✓ Model saved to {path}")
             messagebox.showinfo("Model Saved", f"Saved model to {path}")
         except Exception as e:
             self.log_msg(f"✗ Model save failed: {str(e)}")
             messagebox.showerror("Save Failed", f"Failed to save model: {e}")
 
+    def apply_model_thread(self):
+        if self.current_file_path is None:
+            messagebox.showwarning("No file", "Please select an input file first")
+            return
+        col = self.col_var.get()
+        if not col:
+            messagebox.showwarning("No column", "Please select a text column")
+            return
+        path = filedialog.askopenfilename(
+            filetypes=[("Model bundles", "*.joblib meta.json"), ("Joblib files", "*.joblib"), ("Compact model metadata", "meta.json")],
+            title="Apply Saved Model",
+        )
+        if not path:
+            return
+        self._start_worker(self.apply_model, path, self.current_file_path, col, self.current_sheet)
+
+    def apply_model(self, model_path, file_path, col, sheet_name):
+        """Worker: label the selected column with a saved model (transform + predict, no refit)"""
+        import numpy as np
+
+        self.log_msg("="*60)
+        self.log_msg(f"Applying model {os.path.basename(model_path)} to column '{col}'...")
+        bundle = load_model_bundle(model_path)
+        normalizers = bundle.get("normalizers", DEFAULT_NORMALIZERS)
+        labels = []
+        for chunk in iter_text_column(file_path, col, sheet_name=sheet_name):
+            self._check_cancel()
+            labels.append(predict_labels(bundle, preprocess_texts(coerce_text_column(chunk), normalizers=normalizers)))
+            self.log_msg(f"  Labelled {sum(len(l) for l in labels)} rows")
+        labels = np.concatenate(labels) if labels else np.array([], dtype=int)
+        cluster_names = {int(k): v for k, v in bundle.get("cluster_names", {}).items()}
+        for label in np.unique(labels):
+            cluster_names.setdefault(int(label), f"cluster_{label}")
+        self._set_progress(100)
+        self._ui(
+            self._apply_results,
+            None,
+            bundle["vectorizer"],
+            bundle["model"],
+            labels,
+            bundle.get("top_keywords", {}),
+            cluster_names,
+            normalizers,
+        )
+        self.log_msg("✓ Model applied! Edit names below and click 'Save results'")
+
 
 from ttkthemes import ThemedTk
 
@@ -0,0 +1,45 @@
+"""Tests for the k sweep behind --auto_k."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cluster_tool  # noqa: E402
+
+
+def _blobs(n_per_cluster=15, n_clusters=3, n_features=20, seed=0):
+    rng = np.random.RandomState(seed)
+    rows = []
+    for c in range(n_clusters):
+        centre = np.zeros(n_features)
+        centre[c * 5:(c + 1) * 5] = 1.0
+        rows.append(centre + 0.05 * rng.rand(n_per_cluster, n_features))
+    X = np.vstack(rows)
+    return sp.csr_matrix(X / np.linalg.norm(X, axis=1, keepdims=True))
+
+
+def test_sweep_k_skips_k_at_or_above_row_count():
+    X = _blobs()
+    results = cluster_tool.sweep_k(X, cluster_tool.parse_k_range("2:60"), n_jobs=1)
+    assert [r["k"] for r in results] == list(range(2, X.shape[0]))
+
+
+def test_sweep_k_range_above_row_count_is_a_clear_error():
+    with pytest.raises(ValueError, match=r"50\.\.60.*45 rows"):
+        cluster_tool.sweep_k(_blobs(), cluster_tool.parse_k_range("50:60"), n_jobs=1)
+
+
+@pytest.mark.parametrize("metric", cluster_tool.SWEEP_METRICS)
+def test_choose_best_k_without_results_is_a_clear_error(metric):
+    with pytest.raises(ValueError, match="No k sweep results"):
+        cluster_tool.choose_best_k([], metric)
+
+
+def test_choose_best_k_finds_the_blobs():
+    results = cluster_tool.sweep_k(_blobs(), cluster_tool.parse_k_range("2:6"), n_jobs=1)
+    assert cluster_tool.choose_best_k(results, "silhouette") == 3
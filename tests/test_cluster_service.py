@@ -0,0 +1,116 @@
+"""Localhost tests for cluster_service: a real server on a free port, a small saved model."""
+
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cluster_tool  # noqa: E402
+from cluster_service import ClusterService, make_server  # noqa: E402
+
+TOPICS = {
+    "printer": "printer offline paper jam toner tray printing queue",
+    "password": "password reset login locked account expired credentials",
+    "network": "network wifi vpn connection dropped router latency",
+}
+
+
+def _texts(n_per_topic=20):
+    texts = []
+    for words in TOPICS.values():
+        words = words.split()
+        for i in range(n_per_topic):
+            texts.append(" ".join(words[j % len(words)] for j in range(i, i + 5)))
+    return texts
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory):
+    texts = cluster_tool.preprocess_texts(_texts())
+    vectorizer, X = cluster_tool.vectorize_texts(texts)
+    model, labels = cluster_tool.cluster_texts(X, algorithm="kmeans", n_clusters=len(TOPICS))
+    top_keywords = cluster_tool.get_top_keywords_per_cluster(vectorizer, X, labels, top_n=5)
+    names = cluster_tool.assign_cluster_names(top_keywords, labels=labels)
+    bundle = cluster_tool.build_model_bundle(model, vectorizer, names, top_keywords, X=X, labels=labels)
+    path = str(tmp_path_factory.mktemp("models") / "tickets.joblib")
+    cluster_tool.save_model_bundle(bundle, path)
+    return path
+
+
+@pytest.fixture
+def server(model_path):
+    # a long wait lets concurrent requests pile up into one batch
+    service = ClusterService({"tickets": model_path}, max_batch=1000, max_wait_ms=200)
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    service.close()
+
+
+def _request(server, path, payload=None):
+    """(status, decoded JSON body) for a GET, or a POST when payload is given."""
+    host, port = server.server_address[:2]
+    data = None if payload is None else (payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8"))
+    req = urllib.request.Request(f"http://{host}:{port}{path}", data=data)
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_predict_batches_concurrent_requests(server, model_path):
+    texts = _texts(n_per_topic=4)
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        responses = list(pool.map(lambda t: _request(server, "/predict", {"text": t}), texts))
+
+    bundle = cluster_tool.load_model_bundle(model_path)
+    expected = cluster_tool.predict_labels(bundle, cluster_tool.preprocess_texts(texts))
+    assert [status for status, _ in responses] == [200] * len(texts)
+    assert [body["labels"][0] for _, body in responses] == [int(l) for l in expected]
+    assert all(body["model"] == "tickets" and body["names"][0] for _, body in responses)
+
+    status, stats = _request(server, "/stats")
+    assert status == 200
+    assert stats["tickets"]["requests"] == len(texts)
+    assert stats["tickets"]["batches"] < len(texts)
+
+
+def test_predict_texts_list(server):
+    status, body = _request(server, "/predict", {"texts": ["printer paper jam", "reset my password"], "model": "tickets"})
+    assert status == 200
+    assert len(body["labels"]) == len(body["names"]) == 2
+    assert body["labels"][0] != body["labels"][1]
+
+
+def test_unknown_model_is_404(server):
+    status, body = _request(server, "/predict", {"text": "printer offline", "model": "missing"})
+    assert status == 404
+    assert "missing" in body["error"]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        b"not json",
+        {"nothing": "here"},
+        {"texts": "printer offline"},
+        {"texts": ["printer", 3]},
+        {"text": "printer offline", "model": ["tickets"]},
+        {"text": "printer offline", "model": 7},
+    ],
+)
+def test_bad_input_is_400(server, payload):
+    status, body = _request(server, "/predict", payload)
+    assert status == 400
+    assert body["error"]
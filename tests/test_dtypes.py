@@ -0,0 +1,32 @@
+"""float32 TF-IDF must give the same k-means labels as float64 (benchmark.py --compare_dtypes)."""
+
+import argparse
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+import cluster_tool  # noqa: E402
+
+MIN_AGREEMENT = 0.99
+
+
+@pytest.mark.parametrize("algorithm", benchmark.KMEANS_ALGORITHMS)
+def test_float32_labels_match_float64(algorithm):
+    args = argparse.Namespace(
+        rows=3000,
+        vocab=2000,
+        doc_len=30,
+        topics=6,
+        seed=0,
+        max_features=1000,
+        normalize=",".join(cluster_tool.DEFAULT_NORMALIZERS),
+        preprocess_jobs=1,
+        algorithms=algorithm,
+    )
+    result = benchmark.compare_dtypes(args)
+    assert result["agreement"][algorithm] >= MIN_AGREEMENT
+    assert result["matrix_mb"]["float32"] < result["matrix_mb"]["float64"]
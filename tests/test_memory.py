@@ -0,0 +1,46 @@
+"""Memory bounds: keyword extraction must not densify the TF-IDF matrix."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+import cluster_tool  # noqa: E402
+
+pytestmark = pytest.mark.skipif(cluster_tool._rss_reader() is None, reason="RSS cannot be read on this platform")
+
+# 200k x 2000 float64 is ~3.2 GB dense; centroids are 20 x 2000
+ROWS, FEATURES, NNZ_PER_ROW, CLUSTERS = 200000, 2000, 20, 20
+KEYWORDS_BUDGET_MB = 64
+
+
+def _sparse_tfidf(seed=0):
+    rng = np.random.RandomState(seed)
+    indptr = np.arange(0, ROWS * NNZ_PER_ROW + 1, NNZ_PER_ROW)
+    indices = rng.randint(0, FEATURES, ROWS * NNZ_PER_ROW).astype(np.int32)
+    X = sp.csr_matrix((rng.rand(ROWS * NNZ_PER_ROW), indices, indptr), shape=(ROWS, FEATURES))
+    vectorizer = TfidfVectorizer().fit([" ".join(f"w{i:04d}" for i in range(FEATURES))])
+    return vectorizer, X, rng.randint(0, CLUSTERS, ROWS)
+
+
+def test_keywords_stay_within_budget():
+    vectorizer, X, labels = _sparse_tfidf()
+    profiler = cluster_tool.StageProfiler()
+    with profiler.stage("keywords"):
+        top_keywords = cluster_tool.get_top_keywords_per_cluster(vectorizer, X, labels, top_n=10)
+        cluster_tool.assign_cluster_names(top_keywords, labels=labels)
+
+    assert sorted(top_keywords) == list(range(CLUSTERS))
+    assert profiler.records[0]["rss_delta_mb"] < KEYWORDS_BUDGET_MB
+
+
+@pytest.mark.skipif(not os.environ.get("TEXT_ANALYZER_SLOW_TESTS"), reason="set TEXT_ANALYZER_SLOW_TESTS=1 to run")
+def test_memory_check_at_one_million_rows():
+    # the full benchmark.py --memory_check run: ~1.5 GB peak and several minutes
+    benchmark.main(["--memory_check"])
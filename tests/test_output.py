@@ -0,0 +1,65 @@
+"""Tests for streaming the labelled output (write_labelled_output / write_table_chunks)."""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cluster_tool  # noqa: E402
+
+pytest.importorskip("pyarrow")
+
+
+def _mixed_csv(path, n_rows=1200):
+    # "note" is empty and "id" numeric in the first chunks, both hold text further down
+    pd.DataFrame(
+        {
+            "text": [f"row {i}" for i in range(n_rows)],
+            "note": [None] * 700 + ["hello"] * (n_rows - 700),
+            "id": list(range(600)) + [f"x{i}" for i in range(n_rows - 600)],
+        }
+    ).to_csv(path, index=False)
+
+
+def test_parquet_output_from_csv_chunks_with_changing_dtypes(tmp_path):
+    src, out = str(tmp_path / "in.csv"), str(tmp_path / "out.parquet")
+    _mixed_csv(src)
+    labels = np.arange(1200) % 3
+    cluster_tool.write_labelled_output(src, None, out, labels, [f"c{l}" for l in labels], chunksize=500)
+
+    df = pd.read_parquet(out)
+    assert len(df) == 1200
+    assert df["note"].iloc[0] is None or pd.isna(df["note"].iloc[0])
+    assert df["note"].iloc[-1] == "hello"
+    assert df["id"].iloc[0] == "0" and df["id"].iloc[-1] == "x599"
+    assert df["cluster_label"].tolist() == labels.tolist()
+
+
+def test_labels_only_parquet_with_changing_key_dtype(tmp_path):
+    src, out = str(tmp_path / "in.csv"), str(tmp_path / "out.parquet")
+    _mixed_csv(src)
+    cluster_tool.write_labelled_output(
+        src, None, out, np.zeros(1200, dtype=int), "c0", columns="labels", key_column="id", chunksize=500
+    )
+    assert pd.read_parquet(out)["id"].iloc[-1] == "x599"
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    out = str(tmp_path / "out.parquet")
+
+    def chunks():
+        yield pd.DataFrame({"a": [1, 2]})
+        raise RuntimeError("input went away")
+
+    with pytest.raises(RuntimeError):
+        cluster_tool.write_table_chunks(chunks(), out)
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsupported_output_extension_is_rejected_before_clustering():
+    args = cluster_tool.build_parser().parse_args(["--input", "in.csv", "--column", "text", "--output", "out.json"])
+    assert "Unsupported output format" in cluster_tool.check_args(args)